@@ -1,11 +1,25 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context, send_file, session
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+import base64
 import hashlib
 import sqlite3
+import csv
+import gc
+import io
+import json
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from collections import OrderedDict
 from datetime import datetime
-from database import init_database, get_db_connection
+from database import (init_database, get_db_connection, get_user_stats, parse_db_timestamp, run_migrations,
+                      check_connection_pragmas, init_app as init_database_app)
 from price_predictor import CarPricePredictor
-from invoice_generator import InvoiceGenerator
+from car_search import CarSearchIndex
+from invoice_store import InvoicePdfStore
+from render_queue import InvoiceRenderQueue, RenderQueueFull
 import os
 
 app = Flask(__name__)
@@ -24,21 +38,169 @@ class User(UserMixin):
         self.full_name = full_name
         self.is_admin = is_admin
 
+class UserCache:
+    """Per-process LRU cache of logged-in users with a TTL.
+    
+    Call invalidate() whenever a users row changes. Other worker processes don't see
+    the invalidation, so the TTL bounds how long they can serve stale user data.
+    """
+    
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, user_id):
+        key = str(user_id)
+        with self._lock:
+            entry = self._users.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._users[key]
+                return None
+            self._users.move_to_end(key)
+            return user
+    
+    def put(self, user):
+        key = str(user.id)
+        with self._lock:
+            self._users[key] = (user, time.monotonic() + self.ttl)
+            self._users.move_to_end(key)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+    
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(str(user_id), None)
+
+user_cache = UserCache()
+
 @login_manager.user_loader
 def load_user(user_id):
+    # Most requests only need identity, so serve it without touching the database
+    user_obj = user_cache.get(user_id)
+    if user_obj is not None:
+        return user_obj
+    
     conn = get_db_connection()
     user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
     conn.close()
     if user:
-        return User(user['id'], user['username'], user['email'], user['full_name'], user['is_admin'])
+        user_obj = User(user['id'], user['username'], user['email'], user['full_name'], user['is_admin'])
+        user_cache.put(user_obj)
+        return user_obj
     return None
 
-# Initialize database on first run
-if not os.path.exists('car_predictor.db'):
-    init_database()
-
 predictor = CarPricePredictor()
-invoice_gen = InvoiceGenerator()
+# PDFs are rendered by render_queue workers, which import invoice_generator (and
+# reportlab) on first use, so app startup doesn't pay for them
+invoice_store = InvoicePdfStore()
+render_queue = InvoiceRenderQueue(invoice_store)
+
+class CatalogViews:
+    """Values derived from the car catalog (sorted lists, serialized JSON, ...).
+    
+    Each view is built once per catalog version and dropped as soon as the version
+    changes, so catalog endpoints never re-query or re-serialize an unchanged catalog.
+    """
+    
+    def __init__(self, predictor):
+        self.predictor = predictor
+        self._version = None
+        self._views = {}
+        self._lock = threading.Lock()
+    
+    def version(self):
+        return self.predictor.get_catalog_version()
+    
+    def get(self, key, build):
+        """Get the view for key, calling build(catalog) if it isn't cached for this version"""
+        version = self.version()
+        with self._lock:
+            if version != self._version:
+                self._views = {}
+                self._version = version
+            if key in self._views:
+                return self._views[key]
+        
+        value = build(self.predictor.get_car_catalog())
+        with self._lock:
+            if version == self._version:
+                self._views[key] = value
+        return value
+
+catalog_views = CatalogViews(predictor)
+
+# Browsers and CDNs may reuse catalog responses this long before revalidating their ETag
+CATALOG_MAX_AGE = 60
+
+def sorted_cars(catalog):
+    """Every car ordered by brand and model, as SELECT * FROM cars ORDER BY brand, model"""
+    return sorted(catalog.values(), key=lambda car: (car['brand'], car['model'], car['id']))
+
+def serialized_json(data):
+    """Compact JSON response body and strong ETag (hash of the body) for data"""
+    body = app.json.dumps(data, separators=(',', ':')).encode()
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+def brand_json(catalog):
+    """Serialized /api/cars/<brand> response for every brand in the catalog"""
+    by_brand = {}
+    for car in sorted_cars(catalog):
+        by_brand.setdefault(car['brand'], []).append(car)
+    return {brand: serialized_json(cars) for brand, cars in by_brand.items()}
+
+def create_app(config=None):
+    """Configure the app, prepare the database and warm the shared caches.
+    
+    Run it once in the master of a pre-forking server, e.g.
+    gunicorn --preload -w 16 'app:create_app()', so the schema check runs once
+    and the car catalog and pricing tables loaded here are shared copy-on-write
+    by every forked worker instead of being rebuilt per worker.
+    """
+    if config:
+        app.config.update(config)
+    
+    # One pooled database connection per request
+    init_database_app(app)
+    
+    # Initialize database on first run, then apply any pending schema migrations
+    if not os.path.exists(app.config.get('DATABASE', 'car_predictor.db')):
+        init_database()
+    else:
+        run_migrations()
+    
+    # Report the connection settings in effect; SQLite ignores some silently, so warn
+    # about any that didn't take effect
+    active_pragmas, mismatched_pragmas = check_connection_pragmas()
+    app.logger.info('SQLite PRAGMAs in effect: %s',
+                    ', '.join(f'{pragma}={value}' for pragma, value in active_pragmas.items()))
+    for pragma, (configured, actual) in mismatched_pragmas.items():
+        app.logger.warning('SQLite PRAGMA %s is %r, not the configured %r', pragma, actual, configured)
+    
+    # Market factor mode: 'daily' (default, same price for identical requests on a UTC day) or 'random'
+    predictor.configure_market(app.config.get('MARKET_FACTOR_MODE', 'daily'), app.config.get('MARKET_SEED', 0))
+    predictor.warm_up()
+    
+    # Render processes per web worker process (see render_queue.RENDER_WORKERS)
+    render_queue.configure(app.config.get('RENDER_WORKERS'), app.config.get('MAX_PENDING_RENDERS'))
+    app.extensions['car_predictor_ready'] = True
+    
+    # Move everything loaded so far out of the garbage collector's generations so
+    # collections in the workers don't touch (and un-share) these pages
+    gc.freeze()
+    
+    return app
+
+@app.before_request
+def require_create_app():
+    """Refuse to serve from the bare module-level app, whose database was never prepared"""
+    if not app.extensions.get('car_predictor_ready'):
+        raise RuntimeError("The app must be created with app.create_app(), e.g. "
+                           "gunicorn 'app:create_app()' or flask --app 'app:create_app()' run")
 
 # Indian number formatting function
 def format_indian_currency(amount):
@@ -106,7 +268,10 @@ def login():
             conn.commit()
             conn.close()
             
+            # Refresh the cached copy on every login
             user_obj = User(user['id'], user['username'], user['email'], user['full_name'], user['is_admin'])
+            user_cache.invalidate(user['id'])
+            user_cache.put(user_obj)
             login_user(user_obj)
             
             if user['is_admin']:
@@ -188,20 +353,24 @@ def predict_price():
         city = request.form['city']
         
         # Get car details
-        conn = get_db_connection()
-        car_row = conn.execute('SELECT * FROM cars WHERE id = ?', (car_id,)).fetchone()
+        car = predictor.get_car_details(car_id)
         
-        if car_row:
-            car = dict(car_row)
-            # Calculate predicted price with new parameters (without area_type)
-            predicted_price = predictor.predict_price(car_id, car_age, condition, kilometers_driven, state, city)
+        if car:
+            # Calculate predicted price with new parameters (without area_type), keeping
+            # the breakdown so the result page doesn't have to price it again
+            predicted_price, breakdown = predictor.predict_with_breakdown(
+                car_id, car_age, condition, kilometers_driven, state, city
+            )
             
             # Store prediction in database with new fields
+            conn = get_db_connection()
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO predictions (user_id, car_id, car_age, car_condition, kilometers_driven, city, predicted_price, state)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (current_user.id, car_id, car_age, condition, kilometers_driven, city, predicted_price, state))
+                INSERT INTO predictions (user_id, car_id, car_age, car_condition, kilometers_driven, city,
+                                         predicted_price, state, price_breakdown)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (current_user.id, car_id, car_age, condition, kilometers_driven, city, predicted_price, state,
+                  json.dumps(breakdown, separators=(',', ':'))))
             conn.commit()
             prediction_id = cursor.lastrowid
             conn.close()
@@ -210,15 +379,149 @@ def predict_price():
         else:
             flash('Error in price prediction', 'error')
     
-    # Get all cars for dropdown
-    conn = get_db_connection()
-    cars_rows = conn.execute('SELECT * FROM cars ORDER BY brand, model').fetchall()
-    conn.close()
+    # The form only depends on the catalog and the user, so a browser holding the
+    # current version can reuse its copy; pending flash messages must be rendered though
+    etag = f'predict-{catalog_views.version()}-{current_user.id}'
+    if request.method == 'GET' and not session.get('_flashes') and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        cars = catalog_views.get('sorted_cars', sorted_cars)
+        response = app.make_response(render_template('predict.html', cars=cars))
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# Bulk prediction settings
+BULK_PREDICTION_CHUNK_SIZE = 1000
+BULK_PREDICTION_MAX_ROWS = 100000
+# Formatted results beyond this many characters are spooled to disk
+BULK_PREDICTION_SPOOL_SIZE = 4 * 1024 * 1024
+BULK_PREDICTION_FIELDS = ['car_id', 'car_age', 'condition', 'kilometers_driven', 'state', 'city']
+
+def parse_bulk_prediction_row(row):
+    """Validate one bulk input row, returning a tuple in BULK_PREDICTION_FIELDS order or None"""
+    try:
+        return (
+            int(row['car_id']),
+            int(row['car_age']),
+            str(row['condition']),
+            int(row['kilometers_driven']),
+            str(row['state']),
+            str(row['city'])
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+
+@app.route('/user/predict/bulk', methods=['POST'])
+@login_required
+def predict_price_bulk():
+    """Price many cars in one request from a JSON array or a CSV body.
     
-    # Convert Row objects to dictionaries for JSON serialization
-    cars = [dict(car) for car in cars_rows]
+    Results are streamed back as NDJSON (default) or CSV with ?format=csv. All
+    predictions are stored in a single transaction that is committed before the
+    response starts.
+    """
+    if current_user.is_admin:
+        return jsonify({'error': 'Bulk prediction is only available to users'}), 403
     
-    return render_template('predict.html', cars=cars)
+    if request.mimetype == 'text/csv':
+        rows = list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    else:
+        payload = request.get_json(silent=True)
+        rows = payload.get('rows') if isinstance(payload, dict) else payload
+        if not isinstance(rows, list):
+            return jsonify({'error': 'Expected a JSON array of rows or a CSV body'}), 400
+    
+    if len(rows) > BULK_PREDICTION_MAX_ROWS:
+        return jsonify({'error': f'At most {BULK_PREDICTION_MAX_ROWS} rows per request'}), 413
+    
+    output_format = request.args.get('format', 'ndjson').lower()
+    user_id = current_user.id
+    
+    def format_result(result):
+        if output_format == 'csv':
+            line = io.StringIO()
+            csv.writer(line).writerow([result['row'], result.get('car_id', ''),
+                                       result.get('predicted_price', ''), result.get('error', '')])
+            return line.getvalue()
+        return json.dumps(result) + '\n'
+    
+    # Price and store everything first, writing the formatted results to a temporary
+    # file (in memory until it grows large), so the write transaction is committed
+    # before the response starts streaming instead of staying open while a slow
+    # client reads it
+    output = tempfile.SpooledTemporaryFile(max_size=BULK_PREDICTION_SPOOL_SIZE, mode='w+', newline='')
+    conn = get_db_connection()
+    try:
+        if output_format == 'csv':
+            output.write('row,car_id,predicted_price,error\r\n')
+        
+        for start in range(0, len(rows), BULK_PREDICTION_CHUNK_SIZE):
+            chunk = rows[start:start + BULK_PREDICTION_CHUNK_SIZE]
+            parsed = [parse_bulk_prediction_row(row) if isinstance(row, dict) else None for row in chunk]
+            valid = [values for values in parsed if values is not None]
+            
+            prices = []
+            breakdowns = []
+            if valid:
+                columns = list(zip(*valid))
+                prices = predictor.predict_batch(*columns).tolist()
+                # Stored like single predictions, so result pages don't price them again
+                breakdowns = predictor.batch_breakdowns(*columns, prices)
+            prices = iter(prices)
+            breakdowns = iter(breakdowns)
+            
+            records = []
+            lines = []
+            for offset, values in enumerate(parsed):
+                result = {'row': start + offset}
+                if values is None:
+                    result['error'] = 'Invalid row, expected ' + ', '.join(BULK_PREDICTION_FIELDS)
+                else:
+                    car_id, car_age, condition, kilometers_driven, state, city = values
+                    predicted_price = next(prices)
+                    breakdown = next(breakdowns)
+                    result['car_id'] = car_id
+                    if predicted_price:
+                        result['predicted_price'] = predicted_price
+                        records.append((user_id, car_id, car_age, condition, kilometers_driven,
+                                        city, predicted_price, state,
+                                        json.dumps(breakdown, separators=(',', ':'))))
+                    else:
+                        result['error'] = 'Car not found'
+                lines.append(format_result(result))
+            
+            conn.executemany('''
+                INSERT INTO predictions (user_id, car_id, car_age, car_condition, kilometers_driven, city, predicted_price, state,
+                                         price_breakdown)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', records)
+            output.write(''.join(lines))
+        
+        conn.commit()
+    except Exception:
+        # Undo the chunks inserted so far now; with a pooled connection close() is a
+        # no-op and the pool would only roll back when the request is torn down
+        conn.rollback()
+        output.close()
+        raise
+    finally:
+        conn.close()
+    
+    def generate():
+        try:
+            output.seek(0)
+            while True:
+                data = output.read(64 * 1024)
+                if not data:
+                    break
+                yield data
+        finally:
+            output.close()
+    
+    mimetype = 'text/csv' if output_format == 'csv' else 'application/x-ndjson'
+    return Response(generate(), mimetype=mimetype)
 
 @app.route('/user/prediction/<int:prediction_id>')
 @login_required
@@ -240,15 +543,24 @@ def prediction_result(prediction_id):
     # Convert Row object to dictionary
     prediction = dict(prediction_row)
     
-    # Get detailed breakdown
-    breakdown = predictor.get_price_breakdown(
-        prediction['car_id'], 
-        prediction['car_age'], 
-        prediction['car_condition'], 
-        prediction['kilometers_driven'], 
-        prediction['state'],
-        prediction['city']
-    )
+    # Breakdown stored with the prediction; predictions made before breakdowns were
+    # stored don't have one, so price those again as of the prediction's day
+    stored_breakdown = prediction.pop('price_breakdown', None)
+    if stored_breakdown:
+        breakdown = json.loads(stored_breakdown)
+    else:
+        breakdown = predictor.get_price_breakdown(
+            prediction['car_id'], 
+            prediction['car_age'], 
+            prediction['car_condition'], 
+            prediction['kilometers_driven'], 
+            prediction['state'],
+            prediction['city'],
+            market_date=parse_db_timestamp(prediction['prediction_date'])
+        )
+        if breakdown:
+            # Older rows may predate a catalog or pricing change; show what was charged
+            breakdown['final_price'] = prediction['predicted_price']
     
     return render_template('prediction_result.html', prediction=prediction, breakdown=breakdown)
 
@@ -301,7 +613,14 @@ def generate_invoice(prediction_id):
     
     conn.commit()
     invoice_id = cursor.lastrowid
+    
+    # Start building the PDF now so it's ready by the time it's downloaded
+    invoice = fetch_invoice_for_pdf(conn, invoice_id)
     conn.close()
+    try:
+        render_queue.submit(invoice_id, invoice_store.digest(invoice), invoice)
+    except RenderQueueFull:
+        pass  # Rendered when first downloaded instead
     
     return redirect(url_for('view_invoice', invoice_id=invoice_id))
 
@@ -338,24 +657,8 @@ def user_home():
     
     conn = get_db_connection()
     
-    # Get user statistics
-    user_predictions = conn.execute('''
-        SELECT COUNT(*) as count FROM predictions WHERE user_id = ?
-    ''', (current_user.id,)).fetchone()['count']
-    
-    user_invoices = conn.execute('''
-        SELECT COUNT(*) as count FROM invoices 
-        WHERE prediction_id IN (SELECT id FROM predictions WHERE user_id = ?)
-    ''', (current_user.id,)).fetchone()['count']
-    
-    avg_prediction = conn.execute('''
-        SELECT AVG(predicted_price) as avg FROM predictions WHERE user_id = ?
-    ''', (current_user.id,)).fetchone()['avg']
-    
-    last_prediction = conn.execute('''
-        SELECT prediction_date FROM predictions 
-        WHERE user_id = ? ORDER BY prediction_date DESC LIMIT 1
-    ''', (current_user.id,)).fetchone()
+    # Get user statistics from the summary table
+    stats = get_user_stats(conn, current_user.id)
     
     # Get recent predictions with car details (limit to 3 for home page)
     recent_predictions_rows = conn.execute('''
@@ -373,10 +676,10 @@ def user_home():
     recent_predictions = [dict(row) for row in recent_predictions_rows]
     
     user_stats = {
-        'total_predictions': user_predictions,
-        'total_invoices': user_invoices,
-        'avg_prediction': avg_prediction,
-        'last_prediction_date': last_prediction['prediction_date'] if last_prediction else None
+        'total_predictions': stats['total_predictions'],
+        'total_invoices': stats['total_invoices'],
+        'avg_prediction': stats['avg_prediction'],
+        'last_prediction_date': stats['last_prediction_date']
     }
     
     return render_template('user_home.html', 
@@ -391,28 +694,8 @@ def user_dashboard():
     
     conn = get_db_connection()
     
-    # Get user statistics
-    user_predictions = conn.execute('''
-        SELECT COUNT(*) as count FROM predictions WHERE user_id = ?
-    ''', (current_user.id,)).fetchone()['count']
-    
-    user_invoices = conn.execute('''
-        SELECT COUNT(*) as count FROM invoices 
-        WHERE prediction_id IN (SELECT id FROM predictions WHERE user_id = ?)
-    ''', (current_user.id,)).fetchone()['count']
-    
-    avg_prediction = conn.execute('''
-        SELECT AVG(predicted_price) as avg FROM predictions WHERE user_id = ?
-    ''', (current_user.id,)).fetchone()['avg']
-    
-    highest_prediction = conn.execute('''
-        SELECT MAX(predicted_price) as max FROM predictions WHERE user_id = ?
-    ''', (current_user.id,)).fetchone()['max']
-    
-    last_prediction = conn.execute('''
-        SELECT prediction_date FROM predictions 
-        WHERE user_id = ? ORDER BY prediction_date DESC LIMIT 1
-    ''', (current_user.id,)).fetchone()
+    # Get user statistics from the summary table
+    user_stats = get_user_stats(conn, current_user.id)
     
     # Get all predictions with car details for dashboard
     recent_predictions_rows = conn.execute('''
@@ -428,14 +711,6 @@ def user_dashboard():
     # Convert to dictionaries for JSON serialization
     recent_predictions = [dict(row) for row in recent_predictions_rows]
     
-    user_stats = {
-        'total_predictions': user_predictions,
-        'total_invoices': user_invoices,
-        'avg_prediction': avg_prediction,
-        'highest_prediction': highest_prediction,
-        'last_prediction_date': last_prediction['prediction_date'] if last_prediction else None
-    }
-    
     return render_template('user_dashboard.html', 
                          user_stats=user_stats, 
                          predictions=recent_predictions)
@@ -520,6 +795,7 @@ def admin_add_car():
         )
         conn.commit()
         conn.close()
+        predictor.invalidate_car_catalog()
         
         flash('Car added successfully!', 'success')
         return redirect(url_for('admin_cars'))
@@ -557,17 +833,15 @@ def admin_user_details(user_id):
     
     user = dict(user_row)
     
-    # Get user statistics
-    total_predictions = conn.execute('SELECT COUNT(*) as count FROM predictions WHERE user_id = ?', (user_id,)).fetchone()['count']
-    total_invoices = conn.execute('SELECT COUNT(*) as count FROM invoices WHERE user_id = ?', (user_id,)).fetchone()['count']
-    avg_prediction_price = conn.execute('SELECT AVG(predicted_price) as avg FROM predictions WHERE user_id = ?', (user_id,)).fetchone()['avg']
+    # Get user statistics from the summary table
+    stats = get_user_stats(conn, user_id)
     
     conn.close()
     
     user_stats = {
-        'total_predictions': total_predictions,
-        'total_invoices': total_invoices,
-        'avg_prediction_price': avg_prediction_price or 0
+        'total_predictions': stats['total_predictions'],
+        'total_invoices': stats['total_invoices'],
+        'avg_prediction_price': stats['avg_prediction'] or 0
     }
     
     return render_template('admin_user_details.html', user=user, stats=user_stats)
@@ -611,43 +885,43 @@ def admin_analytics():
     
     conn = get_db_connection()
     
-    # Get comprehensive analytics data
+    # Get comprehensive analytics data; prediction figures come from the monthly rollups
     total_users = conn.execute('SELECT COUNT(*) as count FROM users WHERE is_admin = FALSE').fetchone()['count']
-    total_predictions = conn.execute('SELECT COUNT(*) as count FROM predictions').fetchone()['count']
+    total_predictions = conn.execute(
+        'SELECT COALESCE(SUM(prediction_count), 0) as count FROM prediction_rollups_monthly'
+    ).fetchone()['count']
     total_cars = conn.execute('SELECT COUNT(*) as count FROM cars').fetchone()['count']
     total_invoices = conn.execute('SELECT COUNT(*) as count FROM invoices').fetchone()['count']
     
     # Monthly predictions
     monthly_predictions = conn.execute('''
-        SELECT strftime('%Y-%m', prediction_date) as month, COUNT(*) as count
-        FROM predictions 
-        GROUP BY strftime('%Y-%m', prediction_date)
+        SELECT month, SUM(prediction_count) as count
+        FROM prediction_rollups_monthly
+        GROUP BY month
         ORDER BY month DESC LIMIT 12
     ''').fetchall()
     
     # Top car brands by predictions
     brand_stats = conn.execute('''
-        SELECT c.brand, COUNT(*) as prediction_count
-        FROM predictions p
-        JOIN cars c ON p.car_id = c.id
-        GROUP BY c.brand
+        SELECT brand, SUM(prediction_count) as prediction_count
+        FROM prediction_rollups_monthly
+        GROUP BY brand
         ORDER BY prediction_count DESC LIMIT 10
     ''').fetchall()
     
     # City-wise predictions
     city_stats = conn.execute('''
-        SELECT city, COUNT(*) as count
-        FROM predictions
+        SELECT city, SUM(prediction_count) as count
+        FROM prediction_rollups_monthly
         GROUP BY city
         ORDER BY count DESC LIMIT 10
     ''').fetchall()
     
     # Average predicted prices by brand
     avg_prices = conn.execute('''
-        SELECT c.brand, AVG(p.predicted_price) as avg_price
-        FROM predictions p
-        JOIN cars c ON p.car_id = c.id
-        GROUP BY c.brand
+        SELECT brand, CAST(SUM(price_total) AS REAL) / SUM(prediction_count) as avg_price
+        FROM prediction_rollups_monthly
+        GROUP BY brand
         ORDER BY avg_price DESC
     ''').fetchall()
     
@@ -680,6 +954,151 @@ def admin_settings():
     
     return render_template('admin_settings.html')
 
+# Export settings: query, date column, user column and source tables (for column types)
+EXPORT_CHUNK_SIZE = 1000
+COLUMNAR_EXPORT_CHUNK_SIZE = 50000
+EXPORT_QUERIES = {
+    'users': ('SELECT * FROM users WHERE is_admin = FALSE', 'created_at', 'id', ['users']),
+    'predictions': ('''
+        SELECT p.id, p.user_id, p.car_id, p.car_age, p.car_condition, p.kilometers_driven, p.city,
+               p.predicted_price, p.prediction_date, p.invoice_generated, p.state, p.area_type,
+               c.brand, c.model, u.username
+        FROM predictions p
+        JOIN cars c ON p.car_id = c.id
+        JOIN users u ON p.user_id = u.id
+        WHERE 1 = 1''', 'p.prediction_date', 'p.user_id', ['predictions', 'cars', 'users']),
+    'cars': ('SELECT * FROM cars WHERE 1 = 1', 'created_at', None, ['cars']),
+    'invoices': ('SELECT * FROM invoices WHERE 1 = 1', 'generated_at', 'user_id', ['invoices'])
+}
+COLUMNAR_EXPORT_FORMATS = {
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file')
+}
+
+class StreamingSink(io.RawIOBase):
+    """Write-only file object whose bytes are drained into a streaming response"""
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def arrow_type_for(declared_type):
+    """Map a declared SQLite column type to the Arrow type it is exported as"""
+    import pyarrow as pa
+    
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type:
+        return pa.int64()
+    if declared_type in ('REAL', 'FLOAT', 'DOUBLE'):
+        return pa.float64()
+    if 'BOOL' in declared_type:
+        return pa.bool_()
+    if 'TIMESTAMP' in declared_type or 'DATE' in declared_type:
+        return pa.timestamp('us')
+    return pa.string()
+
+def arrow_value_converter(arrow_type):
+    """Get the function turning a raw SQLite value into the Python value for arrow_type"""
+    import pyarrow as pa
+    
+    if pa.types.is_timestamp(arrow_type):
+        return lambda value: datetime.fromisoformat(value) if isinstance(value, str) else value
+    if pa.types.is_boolean(arrow_type):
+        return lambda value: bool(value) if value is not None else None
+    if pa.types.is_string(arrow_type):
+        return lambda value: str(value) if value is not None else None
+    return lambda value: value
+
+def generate_columnar_export(sql, params, tables, export_format):
+    """Yield a Parquet or Arrow IPC file for the query, one batch (row group) at a time"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    conn = get_db_connection()
+    try:
+        # Declared types by column name; the first table wins for shared names like id
+        declared_types = {}
+        for table in tables:
+            for column in conn.execute(f'PRAGMA table_info({table})'):
+                declared_types.setdefault(column['name'], column['type'])
+        
+        cursor = conn.execute(sql, params)
+        names = [column[0] for column in cursor.description]
+        schema = pa.schema([(name, arrow_type_for(declared_types.get(name))) for name in names])
+        converters = [arrow_value_converter(field.type) for field in schema]
+        
+        sink = StreamingSink()
+        if export_format == 'parquet':
+            writer = pq.ParquetWriter(sink, schema)
+        else:
+            writer = pa.ipc.new_file(sink, schema)
+        
+        while True:
+            rows = cursor.fetchmany(COLUMNAR_EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            columns = [
+                pa.array([convert(row[index]) for row in rows], type=field.type)
+                for index, (field, convert) in enumerate(zip(schema, converters))
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+        
+        writer.close()
+        yield sink.drain()
+    finally:
+        conn.close()
+
+def build_export_query(export_type, args):
+    """Build the SQL and parameters for an export from the request filters"""
+    sql, date_column, user_column, tables = EXPORT_QUERIES[export_type]
+    return apply_export_filters(sql, date_column, user_column, args)
+
+def apply_export_filters(sql, date_column, user_column, args):
+    """Add the request's filters to a query ending in a WHERE clause.
+    
+    Supports start_date and end_date (YYYY-MM-DD, inclusive) and user_id. Raises
+    ValueError for malformed filters.
+    """
+    params = []
+    
+    start_date = args.get('start_date')
+    if start_date:
+        datetime.strptime(start_date, '%Y-%m-%d')
+        sql += f' AND {date_column} >= ?'
+        params.append(start_date)
+    
+    end_date = args.get('end_date')
+    if end_date:
+        datetime.strptime(end_date, '%Y-%m-%d')
+        sql += f" AND {date_column} < date(?, '+1 day')"
+        params.append(end_date)
+    
+    user_id = args.get('user_id')
+    if user_id and user_column:
+        sql += f' AND {user_column} = ?'
+        params.append(int(user_id))
+    
+    return sql, params
+
 @app.route('/admin/export')
 @login_required
 def admin_export():
@@ -687,56 +1106,196 @@ def admin_export():
         return redirect(url_for('user_dashboard'))
     
     export_type = request.args.get('type', 'users')
+    if export_type not in EXPORT_QUERIES:
+        export_type = 'invoices'
+    compress = request.args.get('gzip', 'false').lower() in ('1', 'true')
     
-    conn = get_db_connection()
+    export_format = request.args.get('format', 'csv').lower()
     
-    if export_type == 'users':
-        data_rows = conn.execute('SELECT * FROM users WHERE is_admin = FALSE').fetchall()
-        data = [dict(row) for row in data_rows]
-        filename = 'users_export.csv'
-    elif export_type == 'predictions':
-        data_rows = conn.execute('''
-            SELECT p.*, c.brand, c.model, u.username
-            FROM predictions p
-            JOIN cars c ON p.car_id = c.id
-            JOIN users u ON p.user_id = u.id
-        ''').fetchall()
-        data = [dict(row) for row in data_rows]
-        filename = 'predictions_export.csv'
-    elif export_type == 'cars':
-        data_rows = conn.execute('SELECT * FROM cars').fetchall()
-        data = [dict(row) for row in data_rows]
-        filename = 'cars_export.csv'
-    else:
-        data_rows = conn.execute('SELECT * FROM invoices').fetchall()
-        data = [dict(row) for row in data_rows]
-        filename = 'invoices_export.csv'
+    try:
+        sql, params = build_export_query(export_type, request.args)
+    except ValueError:
+        return "Invalid filter: use YYYY-MM-DD dates and a numeric user_id", 400
     
-    conn.close()
+    if export_format in COLUMNAR_EXPORT_FORMATS:
+        try:
+            import pyarrow
+        except ImportError:
+            return "Columnar export not available. Please install pyarrow.", 500
+        
+        extension, mimetype = COLUMNAR_EXPORT_FORMATS[export_format]
+        tables = EXPORT_QUERIES[export_type][3]
+        return Response(
+            stream_with_context(generate_columnar_export(sql, params, tables, export_format)),
+            mimetype=mimetype,
+            headers={
+                'Content-Disposition': f'attachment; filename={export_type}_export.{extension}'
+            }
+        )
     
-    # Create CSV content
-    import csv
-    import io
-    from flask import Response
+    def generate():
+        # Stream the CSV in fetchmany chunks so memory stays flat for any table size
+        conn = get_db_connection()
+        try:
+            cursor = conn.execute(sql, params)
+            output = io.StringIO()
+            writer = csv.writer(output)
+            compressor = zlib.compressobj(wbits=31) if compress else None  # gzip container
+            
+            writer.writerow([column[0] for column in cursor.description])
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    writer.writerow([str(value) if value is not None else '' for value in row])
+                
+                data = output.getvalue().encode('utf-8')
+                output.seek(0)
+                output.truncate()
+                if compressor:
+                    data = compressor.compress(data)
+                if data:
+                    yield data
+            
+            # Flush what's left (the header of an empty export) and the gzip trailer
+            data = output.getvalue().encode('utf-8')
+            if compressor:
+                data = compressor.compress(data) + compressor.flush()
+            if data:
+                yield data
+        finally:
+            conn.close()
     
-    output = io.StringIO()
-    writer = csv.writer(output)
+    filename = f'{export_type}_export.csv'
+    mimetype = 'text/csv'
+    if compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
     
-    if data:
-        # Write header
-        writer.writerow(data[0].keys())
-        # Write data
-        for row in data:
-            writer.writerow([str(value) if value is not None else '' for value in row.values()])
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename={filename}'
+        }
+    )
+
+# Bulk invoice PDF export
+BULK_INVOICE_QUERY = '''
+    SELECT i.*, p.predicted_price, p.car_age, p.kilometers_driven, p.car_condition, p.city, p.state, p.user_id,
+           c.brand, c.model, c.year, u.username, u.email, u.full_name, u.phone
+    FROM invoices i
+    JOIN predictions p ON i.prediction_id = p.id
+    JOIN cars c ON p.car_id = c.id
+    JOIN users u ON p.user_id = u.id
+    WHERE 1 = 1'''
+# The combined PDF is one document built by a single render worker before the first
+# byte is sent (~2.5 ms per invoice), so it is capped well below what format=zip handles
+BULK_INVOICE_PDF_MAX = 200
+
+@app.route('/admin/invoices/export')
+@login_required
+def admin_export_invoices():
+    """Download many invoices at once, filtered like admin_export.
     
-    output.seek(0)
+    format=zip (default) streams a ZIP of per-invoice PDFs rendered in parallel by
+    the render workers, listing any that failed in errors.txt; format=pdf returns at
+    most BULK_INVOICE_PDF_MAX of them combined into a single PDF, built in one piece
+    before it is sent.
+    """
+    if not current_user.is_admin:
+        return redirect(url_for('user_dashboard'))
+    
+    export_format = request.args.get('format', 'zip').lower()
+    
+    try:
+        sql, params = apply_export_filters(BULK_INVOICE_QUERY, 'i.generated_at', 'i.user_id', request.args)
+    except ValueError:
+        return "Invalid filter: use YYYY-MM-DD dates and a numeric user_id", 400
+    sql += ' ORDER BY i.id'
+    
+    if export_format == 'pdf':
+        conn = get_db_connection()
+        invoices = [dict(row) for row in conn.execute(sql + ' LIMIT ?', params + [BULK_INVOICE_PDF_MAX + 1])]
+        conn.close()
+        
+        if not invoices:
+            return "No invoices match the filters", 404
+        if len(invoices) > BULK_INVOICE_PDF_MAX:
+            return f"More than {BULK_INVOICE_PDF_MAX} invoices match; narrow the filters or use format=zip", 413
+        
+        # The combined document is built on a render worker into a temporary file,
+        # then streamed back from disk
+        output = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+        output.close()
+        try:
+            render_queue.render_combined(invoices, output.name)
+        except Exception as e:
+            os.unlink(output.name)
+            return f"Error building PDF: {str(e)}", 500
+        
+        def stream_combined():
+            try:
+                with open(output.name, 'rb') as pdf_file:
+                    while True:
+                        data = pdf_file.read(64 * 1024)
+                        if not data:
+                            break
+                        yield data
+            finally:
+                os.unlink(output.name)
+        
+        return Response(
+            stream_combined(),
+            mimetype='application/pdf',
+            headers={
+                'Content-Disposition': 'attachment; filename=invoices.pdf',
+                'Content-Length': str(os.path.getsize(output.name))
+            }
+        )
+    
+    def stream_zip():
+        conn = get_db_connection()
+        try:
+            cursor = conn.execute(sql, params)
+            
+            def invoices():
+                while True:
+                    rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(row)
+            
+            # PDFs are already compressed, so store them as-is. The headers are sent
+            # before anything is rendered, so a failed invoice is listed in errors.txt
+            # rather than cutting the archive short
+            sink = StreamingSink()
+            errors = []
+            with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+                for invoice, pdf_path, error in render_queue.render_all(invoices()):
+                    name = f"invoice_INV-{invoice['id']:06d}.pdf"
+                    if error is None:
+                        try:
+                            with open(pdf_path, 'rb') as pdf_file:
+                                archive.writestr(name, pdf_file.read())
+                        except OSError as e:
+                            error = str(e)
+                    if error is not None:
+                        errors.append(f"{name}: {error}")
+                    yield sink.drain()
+                if errors:
+                    archive.writestr('errors.txt', '\n'.join(errors) + '\n')
+            yield sink.drain()
+        finally:
+            conn.close()
     
     return Response(
-        output.getvalue(),
-        mimetype='text/csv',
+        stream_with_context(stream_zip()),
+        mimetype='application/zip',
         headers={
-            'Content-Disposition': f'attachment; filename={filename}',
-            'Content-Type': 'text/csv; charset=utf-8'
+            'Content-Disposition': 'attachment; filename=invoices.zip'
         }
     )
 
@@ -748,12 +1307,8 @@ def admin_export_page():
     
     return render_template('admin_export.html')
 
-@app.route('/download_invoice_pdf/<int:invoice_id>')
-@login_required
-def download_invoice_pdf(invoice_id):
-    # Add debug parameter to force download
-    force_download = request.args.get('download', 'false').lower() == 'true'
-    conn = get_db_connection()
+def fetch_invoice_for_pdf(conn, invoice_id):
+    """Get the joined invoice row a PDF is rendered from, as a dict"""
     invoice = conn.execute('''
         SELECT i.*, p.predicted_price, p.car_age, p.kilometers_driven, p.car_condition, p.city, p.state, p.user_id,
                c.brand, c.model, c.year, u.username, u.email, u.full_name, u.phone
@@ -763,157 +1318,111 @@ def download_invoice_pdf(invoice_id):
         JOIN users u ON p.user_id = u.id
         WHERE i.id = ?
     ''', (invoice_id,)).fetchone()
+    return dict(invoice) if invoice else None
+
+def load_invoice_for_pdf(invoice_id):
+    """Load an invoice the current user may download, or return an error response"""
+    conn = get_db_connection()
+    invoice = fetch_invoice_for_pdf(conn, invoice_id)
+    conn.close()
     
     if not invoice:
-        conn.close()
-        return "Invoice not found", 404
+        return None, ("Invoice not found", 404)
     
     # Check if user owns this invoice or is admin
     if not current_user.is_admin and invoice['user_id'] != current_user.id:
-        conn.close()
-        return "Access denied", 403
-    
-    conn.close()
+        return None, ("Access denied", 403)
     
-    # Generate PDF using ReportLab
-    try:
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.lib import colors
-        from flask import Response
-        import io
-        from datetime import datetime
-    except ImportError:
-        return "PDF generation not available. Please install reportlab.", 500
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-    
-    # Container for the 'Flowable' objects
-    elements = []
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=30,
-        textColor=colors.HexColor('#2c3e50')
-    )
-    
-    # Title
-    elements.append(Paragraph("Car Price Predictor", title_style))
-    elements.append(Paragraph("Price Prediction Invoice", styles['Heading2']))
-    elements.append(Spacer(1, 20))
-    
-    # Invoice details
-    invoice_data = [
-        ['Invoice ID:', f"INV-{invoice['id']:06d}"],
-        ['Date:', datetime.now().strftime('%d %B %Y')],
-        ['Customer:', invoice['username']],
-        ['Email:', invoice['email']],
-    ]
-    
-    invoice_table = Table(invoice_data, colWidths=[2*inch, 4*inch])
-    invoice_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-    ]))
-    
-    elements.append(invoice_table)
-    elements.append(Spacer(1, 30))
-    
-    # Car details
-    elements.append(Paragraph("Car Details", styles['Heading3']))
-    car_data = [
-        ['Brand:', invoice['brand']],
-        ['Model:', invoice['model']],
-        ['Year:', str(invoice['year'])],
-        ['Age:', f"{invoice['car_age']} years"],
-        ['Condition:', invoice['car_condition'].title()],
-        ['Kilometers:', f"{invoice['kilometers_driven']:,} km"],
-        ['Location:', f"{invoice['city']}, {invoice['state']}"],
-    ]
-    
-    car_table = Table(car_data, colWidths=[2*inch, 4*inch])
-    car_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f8f9fa')),
-    ]))
-    
-    elements.append(car_table)
-    elements.append(Spacer(1, 30))
-    
-    # Price details
-    elements.append(Paragraph("Price Prediction", styles['Heading3']))
-    price_style = ParagraphStyle(
-        'PriceStyle',
-        parent=styles['Normal'],
-        fontSize=18,
-        textColor=colors.HexColor('#27ae60'),
-        alignment=1  # Center alignment
-    )
-    
-    elements.append(Paragraph(f"Predicted Price: ₹{invoice['predicted_price']:,}", price_style))
-    elements.append(Spacer(1, 20))
-    
-    # Footer
-    elements.append(Spacer(1, 50))
-    footer_text = """
-    <para align="center">
-    <b>Car Price Predictor</b><br/>
-    Thank you for using our service!<br/>
-    This prediction is based on current market conditions and provided information.
-    </para>
-    """
-    elements.append(Paragraph(footer_text, styles['Normal']))
-    
-    # Build PDF with error handling
-    try:
-        doc.build(elements)
-    except Exception as e:
-        buffer.close()
-        return f"Error building PDF: {str(e)}", 500
+    return invoice, None
+
+@app.route('/download_invoice_pdf/<int:invoice_id>')
+@login_required
+def download_invoice_pdf(invoice_id):
+    # Add debug parameter to force download
+    force_download = request.args.get('download', 'false').lower() == 'true'
+    invoice, error = load_invoice_for_pdf(invoice_id)
+    if error:
+        return error
     
-    # Get the value of the BytesIO buffer and return as response
-    pdf_data = buffer.getvalue()
-    buffer.close()
+    # Invoices never change once created, so a render is reused until its data hash changes
+    digest = invoice_store.digest(invoice)
+    pdf_path = invoice_store.get(invoice_id, digest)
     
-    # Validate PDF starts with proper PDF header
-    if not pdf_data.startswith(b'%PDF-'):
-        return "Invalid PDF generated", 500
+    if pdf_path is None:
+        # PDFs are built by the render workers; tell the client where to poll
+        try:
+            render_queue.submit(invoice_id, digest, invoice)
+        except RenderQueueFull:
+            return jsonify({'status': 'busy', 'error': 'Too many invoices are being rendered, try again shortly'}), 503
+        
+        response = jsonify({
+            'status': render_queue.status(invoice_id, digest),
+            'status_url': url_for('invoice_pdf_status', invoice_id=invoice_id)
+        })
+        response.status_code = 202
+        response.headers['Location'] = url_for('invoice_pdf_status', invoice_id=invoice_id)
+        response.headers['Retry-After'] = '1'
+        return response
     
     filename = f"invoice_INV-{invoice['id']:06d}.pdf"
     
-    # Validate PDF data
-    if len(pdf_data) < 100:  # PDF should be at least 100 bytes
-        return "Error generating PDF", 500
-    
-    # Ensure proper PDF file extension
-    if not filename.endswith('.pdf'):
-        filename = filename + '.pdf'
-    
-    # Try inline display first, fallback to attachment
-    response = Response(
-        pdf_data,
-        mimetype='application/pdf'
+    # Always force download, no preview; ETag/Last-Modified answer conditional GETs with 304
+    response = send_file(
+        pdf_path,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=filename,
+        etag=digest,
+        last_modified=parse_db_timestamp(invoice['generated_at']),
+        conditional=True
     )
-    
-    # Always force download, no preview
-    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Length'] = str(len(pdf_data))
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
     
     return response
 
+@app.route('/download_invoice_pdf/<int:invoice_id>/status')
+@login_required
+def invoice_pdf_status(invoice_id):
+    invoice, error = load_invoice_for_pdf(invoice_id)
+    if error:
+        return jsonify({'error': error[0]}), error[1]
+    
+    digest = invoice_store.digest(invoice)
+    status = render_queue.status(invoice_id, digest)
+    if status == 'missing':
+        # Queued by another worker process (whose queue this one can't see) or not at
+        # all; render it here too so the poll always makes progress
+        try:
+            render_queue.submit(invoice_id, digest, invoice)
+        except RenderQueueFull:
+            return jsonify({'status': 'busy', 'error': 'Too many invoices are being rendered, try again shortly'}), 503
+        status = render_queue.status(invoice_id, digest)
+    result = {'status': status}
+    if status == 'ready':
+        result['download_url'] = url_for('download_invoice_pdf', invoice_id=invoice_id)
+    elif status == 'failed':
+        result['error'] = render_queue.error(invoice_id, digest)
+    
+    return jsonify(result)
+
+@app.route('/admin/render_queue')
+@login_required
+def admin_render_queue():
+    if not current_user.is_admin:
+        return redirect(url_for('user_dashboard'))
+    
+    return jsonify(render_queue.stats())
+
+@app.route('/admin/prediction_cache')
+@login_required
+def admin_prediction_cache():
+    if not current_user.is_admin:
+        return redirect(url_for('user_dashboard'))
+    
+    cache = predictor.prediction_cache
+    return jsonify(cache.stats() if cache else {'enabled': False})
+
 @app.route('/about')
 @app.route('/about-us')
 def about_us():
@@ -933,13 +1442,114 @@ def contact_form():
         
         return redirect(url_for('about_us'))
 
-@app.route('/api/cars/<brand>')
-def api_cars_by_brand(brand):
+# Catalog API page sizes
+CATALOG_PAGE_DEFAULT = 50
+CATALOG_PAGE_MAX = 200
+
+# Query parameter -> (SQL condition, value parser) for /api/cars
+CATALOG_FILTERS = {
+    'brand': ('brand = ?', str),
+    'fuel_type': ('fuel_type = ?', str),
+    'transmission': ('transmission = ?', str),
+    'year_min': ('year >= ?', int),
+    'year_max': ('year <= ?', int),
+    'price_min': ('base_price >= ?', int),
+    'price_max': ('base_price <= ?', int)
+}
+
+def encode_catalog_cursor(car):
+    """Opaque cursor pointing just after car in (brand, model, id) order"""
+    key = json.dumps([car['brand'], car['model'], car['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip('=')
+
+def decode_catalog_cursor(cursor):
+    """Parse a cursor from encode_catalog_cursor, raising ValueError if it is malformed"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        brand, model, car_id = key
+    except (TypeError, ValueError, UnicodeDecodeError) as error:
+        raise ValueError('Invalid cursor') from error
+    if not (isinstance(brand, str) and isinstance(model, str) and isinstance(car_id, int)):
+        raise ValueError('Invalid cursor')
+    return brand, model, car_id
+
+def build_catalog_query(args):
+    """Build the SQL and parameters for one /api/cars page, raising ValueError for bad input.
+    
+    Pages are ordered by (brand, model, id) and continue from the cursor with a
+    row-value comparison, so every page is an index range scan instead of an OFFSET
+    that reads and discards all earlier rows.
+    """
+    sql = 'SELECT * FROM cars WHERE 1 = 1'
+    params = []
+    
+    for name, (condition, parse) in CATALOG_FILTERS.items():
+        value = args.get(name)
+        if value:
+            try:
+                params.append(parse(value))
+            except ValueError:
+                raise ValueError(f'{name} must be a number') from None
+            sql += f' AND {condition}'
+    
+    cursor = args.get('cursor')
+    if cursor:
+        sql += ' AND (brand, model, id) > (?, ?, ?)'
+        params.extend(decode_catalog_cursor(cursor))
+    
+    try:
+        limit = int(args.get('limit', CATALOG_PAGE_DEFAULT))
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ValueError('limit must be a positive number')
+    limit = min(limit, CATALOG_PAGE_MAX)
+    
+    # Fetch one extra row to know whether there is a next page
+    sql += ' ORDER BY brand, model, id LIMIT ?'
+    params.append(limit + 1)
+    return sql, params, limit
+
+@app.route('/api/cars')
+def api_cars():
+    """Page through the car catalog, optionally filtered.
+    
+    Filters: brand, fuel_type, transmission, year_min, year_max, price_min and
+    price_max (base price). Returns up to `limit` cars (default 50, at most 200) and
+    a next_cursor to pass back as ?cursor= for the following page, or null at the end.
+    """
+    try:
+        sql, params, limit = build_catalog_query(request.args)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    
     conn = get_db_connection()
-    cars = conn.execute('SELECT * FROM cars WHERE brand = ? ORDER BY model', (brand,)).fetchall()
+    rows = conn.execute(sql, params).fetchall()
     conn.close()
     
-    return jsonify([dict(car) for car in cars])
+    cars = [dict(row) for row in rows[:limit]]
+    next_cursor = encode_catalog_cursor(cars[-1]) if len(rows) > limit else None
+    return jsonify({'items': cars, 'next_cursor': next_cursor})
+
+# Autocomplete result limits
+CAR_SEARCH_DEFAULT = 10
+CAR_SEARCH_MAX = 50
+
+@app.route('/api/cars/search')
+def api_cars_search():
+    """Autocomplete over car brand and model: cars whose name, or a later word of it, starts with q"""
+    limit = min(request.args.get('limit', CAR_SEARCH_DEFAULT, type=int) or CAR_SEARCH_DEFAULT, CAR_SEARCH_MAX)
+    index = catalog_views.get('search_index', lambda catalog: CarSearchIndex(sorted_cars(catalog)))
+    return jsonify({'items': index.search(request.args.get('q', ''), limit)})
+
+@app.route('/api/cars/<brand>')
+def api_cars_by_brand(brand):
+    body, etag = catalog_views.get('brand_json', brand_json).get(brand) or serialized_json([])
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = CATALOG_MAX_AGE
+    return response.make_conditional(request)
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
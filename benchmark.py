@@ -0,0 +1,126 @@
+"""Micro-benchmarks for the app's hot paths.
+
+Usage:
+    python benchmark.py              # run every benchmark
+    python benchmark.py invoice      # run one benchmark by name
+
+The pricing benchmark reads the car catalog from car_predictor.db (applying any
+pending migrations first, as app startup does).
+
+The importtime benchmark exits non-zero if importing app pulls in any of
+LAZY_MODULES; tests/test_startup.py checks the same thing under pytest.
+"""
+import random
+import subprocess
+import sys
+import time
+
+SAMPLE_INVOICE = {
+    'id': 1,
+    'generated_at': '2025-09-06 12:35:05',
+    'username': 'rahul',
+    'email': 'rahul@example.com',
+    'brand': 'Maruti Suzuki',
+    'model': 'Swift',
+    'year': 2023,
+    'car_age': 2,
+    'car_condition': 'good',
+    'kilometers_driven': 40000,
+    'city': 'mumbai',
+    'state': 'maharashtra',
+    'predicted_price': 550000
+}
+
+def timed(function, count):
+    """Average seconds per call of function over count calls, after one warm-up call"""
+    function()
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count
+
+def bench_invoice(count=300):
+    """Per-invoice render time of InvoiceGenerator.render_to_bytes"""
+    from invoice_generator import InvoiceGenerator
+
+    generator = InvoiceGenerator()
+    per_invoice = timed(lambda: generator.render_to_bytes(SAMPLE_INVOICE), count)
+    print(f"invoice render: {per_invoice * 1000:.2f} ms per invoice ({count} renders)")
+
+def pricing_cases(car_ids, count, seed=0):
+    """Reproducible spread of predict_price arguments covering every age, condition and mileage branch"""
+    rng = random.Random(seed)
+    return [
+        (rng.choice(car_ids), rng.randint(0, 20), rng.choice(['excellent', 'good', 'fair', 'poor']),
+         rng.randint(0, 250000), rng.choice(['maharashtra', 'delhi', 'bihar', 'goa', 'unknown']),
+         rng.choice(['mumbai', 'pune', 'new-delhi', 'unknown']))
+        for _ in range(count)
+    ]
+
+def bench_pricing(count=10000, rounds=20):
+    """Per-prediction CPU time of CarPricePredictor.predict_price (uncached and cached) and predict_batch"""
+    from database import run_migrations
+    from price_predictor import CarPricePredictor
+
+    run_migrations()
+    predictor = CarPricePredictor(cache_size=0)
+    predictor.warm_up()
+    cases = pricing_cases(sorted(predictor.get_car_catalog()), count)
+
+    def predict_all(predictor):
+        for case in cases:
+            predictor.predict_price(*case)
+
+    per_prediction = timed(lambda: predict_all(predictor), rounds) / count
+    print(f"predict_price: {per_prediction * 1e6:.2f} us per prediction ({count} cases x {rounds})")
+
+    # Every round after the warm-up call repeats the same cases, so these are all cache hits
+    cached = CarPricePredictor(cache_size=count)
+    cached.warm_up()
+    per_hit = timed(lambda: predict_all(cached), rounds) / count
+    print(f"predict_price cached: {per_hit * 1e6:.2f} us per prediction ({count} cases x {rounds})")
+
+    columns = list(zip(*cases))
+    per_row = timed(lambda: predictor.predict_batch(*columns), rounds) / count
+    print(f"predict_batch: {per_row * 1e6:.3f} us per prediction ({count} rows x {rounds})")
+
+# Heavy modules app.py must only import on first use
+LAZY_MODULES = ['reportlab', 'invoice_generator', 'numpy', 'pyarrow']
+
+def bench_importtime(top=10):
+    """Cold import profile of app (python -X importtime), failing if a lazy module is loaded"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        capture_output=True, text=True, check=True
+    )
+
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        timings.append((int(cumulative_us), int(self_us), module.strip()))
+
+    total_us = next(cumulative for cumulative, _, module in timings if module == 'app')
+    print(f"import app: {total_us / 1000:.1f} ms cumulative")
+    for cumulative, self_us, module in sorted(timings, reverse=True)[1:top + 1]:
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+    loaded = {module.split('.')[0] for _, _, module in timings}
+    eager = [module for module in LAZY_MODULES if module in loaded]
+    if eager:
+        sys.exit(f"importing app loaded modules that must stay lazy: {', '.join(eager)}")
+
+BENCHMARKS = {
+    'invoice': bench_invoice,
+    'pricing': bench_pricing,
+    'importtime': bench_importtime
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            sys.exit(f"Unknown benchmark {name!r}, choose from: {', '.join(BENCHMARKS)}")
+        BENCHMARKS[name]()
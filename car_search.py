@@ -0,0 +1,50 @@
+from bisect import bisect_left
+
+def normalize(text):
+    """Lowercase text and collapse runs of whitespace, as both names and queries are compared"""
+    return ' '.join(str(text).lower().split())
+
+class CarSearchIndex:
+    """In-memory prefix index over car names for search-as-you-type.
+
+    Names are kept as sorted arrays, so a lookup is a binary search for the query
+    followed by a scan of only the matching entries. There are two tiers: full
+    "brand model" names, then every later word start ("suzuki swift", "swift"), so
+    a brand or exact name match ranks above a match in the middle of a name.
+    """
+
+    def __init__(self, cars):
+        self.cars = list(cars)
+        self.tiers = []
+
+        full_names = []
+        word_starts = []
+        for position, car in enumerate(self.cars):
+            words = normalize(f"{car['brand']} {car['model']}").split(' ')
+            full_names.append((' '.join(words), position))
+            for start in range(1, len(words)):
+                word_starts.append((' '.join(words[start:]), position))
+
+        for entries in (full_names, word_starts):
+            entries.sort()
+            self.tiers.append(([key for key, _ in entries], [position for _, position in entries]))
+
+    def search(self, query, limit=10):
+        """Cars whose name, or any word onwards in it, starts with query; at most limit of them"""
+        prefix = normalize(query)
+        if not prefix or limit < 1:
+            return []
+
+        found = []
+        seen = set()
+        for keys, positions in self.tiers:
+            index = bisect_left(keys, prefix)
+            while index < len(keys) and keys[index].startswith(prefix):
+                position = positions[index]
+                if position not in seen:
+                    seen.add(position)
+                    found.append(self.cars[position])
+                    if len(found) >= limit:
+                        return found
+                index += 1
+        return found
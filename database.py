@@ -1,10 +1,27 @@
 import sqlite3
 from datetime import datetime
 import hashlib
+import os
+import queue
+
+DATABASE_PATH = 'car_predictor.db'
+
+# Idle connections kept around for reuse by later requests
+POOL_SIZE = 8
+
+# Applied once to every new connection; override with the SQLITE_PRAGMAS app config key
+CONNECTION_PRAGMAS = {
+    'journal_mode': 'WAL',        # readers don't block the writer and vice versa
+    'synchronous': 'NORMAL',      # safe with WAL, avoids an fsync per commit
+    'busy_timeout': 5000,         # ms to wait for a lock before "database is locked"
+    'cache_size': -20000,         # negative means KiB, so ~20 MB of page cache
+    'mmap_size': 268435456,       # 256 MB of memory-mapped reads
+    'temp_store': 'MEMORY'
+}
 
 def init_database():
     """Initialize the SQLite database with all required tables"""
-    conn = sqlite3.connect('car_predictor.db')
+    conn = create_connection()
     cursor = conn.cursor()
     
     # Users table
@@ -60,17 +77,6 @@ def init_database():
         )
     ''')
     
-    # Add new columns to existing predictions table if they don't exist
-    try:
-        cursor.execute('ALTER TABLE predictions ADD COLUMN state VARCHAR(50)')
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
-    try:
-        cursor.execute('ALTER TABLE predictions ADD COLUMN area_type VARCHAR(20)')
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-    
     # Invoices table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS invoices (
@@ -305,14 +311,392 @@ def init_database():
     ''', sample_cars)
     
     conn.commit()
+    
+    # Bring the schema (columns, indexes) up to date
+    run_migrations(conn)
+    
     conn.close()
     print("Database initialized successfully!")
 
-def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect('car_predictor.db')
+def parse_db_timestamp(value):
+    """Parse a SQLite TIMESTAMP value (stored as text) into a datetime"""
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value) if value else None
+
+def add_column_if_missing(cursor, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists"""
+    columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
+    if column not in columns:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def migrate_prediction_location(cursor):
+    """Add state and area_type to predictions tables created before they existed"""
+    add_column_if_missing(cursor, 'predictions', 'state', 'VARCHAR(50)')
+    add_column_if_missing(cursor, 'predictions', 'area_type', 'VARCHAR(20)')
+
+def rebuild_user_stats(cursor):
+    """Recompute the user_stats summary rows from predictions and invoices"""
+    cursor.execute('DELETE FROM user_stats')
+    cursor.execute('''
+        INSERT INTO user_stats (user_id, total_predictions, total_price, highest_prediction, last_prediction_date)
+        SELECT user_id, COUNT(*), SUM(predicted_price), MAX(predicted_price), MAX(prediction_date)
+        FROM predictions
+        GROUP BY user_id
+    ''')
+    cursor.execute('''
+        INSERT INTO user_stats (user_id, total_invoices)
+        SELECT user_id, COUNT(*) FROM invoices WHERE TRUE GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET total_invoices = excluded.total_invoices
+    ''')
+
+def migrate_user_stats(cursor):
+    """Per-user aggregates kept up to date by triggers on predictions and invoices"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            total_predictions INTEGER NOT NULL DEFAULT 0,
+            total_price INTEGER NOT NULL DEFAULT 0,
+            highest_prediction INTEGER,
+            last_prediction_date TIMESTAMP,
+            total_invoices INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_predictions_user_stats
+        AFTER INSERT ON predictions
+        BEGIN
+            INSERT INTO user_stats (user_id, total_predictions, total_price, highest_prediction, last_prediction_date)
+            VALUES (NEW.user_id, 1, NEW.predicted_price, NEW.predicted_price, NEW.prediction_date)
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_predictions = total_predictions + 1,
+                total_price = total_price + excluded.total_price,
+                highest_prediction = MAX(COALESCE(highest_prediction, 0), excluded.highest_prediction),
+                last_prediction_date = MAX(COALESCE(last_prediction_date, ''), excluded.last_prediction_date);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_invoices_user_stats
+        AFTER INSERT ON invoices
+        BEGIN
+            INSERT INTO user_stats (user_id, total_invoices)
+            VALUES (NEW.user_id, 1)
+            ON CONFLICT (user_id) DO UPDATE SET total_invoices = total_invoices + 1;
+        END
+    ''')
+    rebuild_user_stats(cursor)
+
+def get_user_stats(conn, user_id):
+    """Get a user's prediction and invoice aggregates with a single primary key lookup"""
+    row = conn.execute('SELECT * FROM user_stats WHERE user_id = ?', (user_id,)).fetchone()
+    if not row:
+        return {
+            'total_predictions': 0,
+            'total_invoices': 0,
+            'avg_prediction': None,
+            'highest_prediction': None,
+            'last_prediction_date': None
+        }
+    return {
+        'total_predictions': row['total_predictions'],
+        'total_invoices': row['total_invoices'],
+        'avg_prediction': row['total_price'] / row['total_predictions'] if row['total_predictions'] else None,
+        'highest_prediction': row['highest_prediction'],
+        'last_prediction_date': row['last_prediction_date']
+    }
+
+# Analytics rollup tables and the SQL expression that buckets a prediction_date into each
+ROLLUP_PERIODS = {
+    'prediction_rollups_daily': ('day', "date({column})"),
+    'prediction_rollups_monthly': ('month', "strftime('%Y-%m', {column})")
+}
+
+def rebuild_prediction_rollups(cursor):
+    """Recompute the analytics rollup tables from the full predictions history"""
+    for table, (period, bucket) in ROLLUP_PERIODS.items():
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(f'''
+            INSERT INTO {table} ({period}, brand, state, city, prediction_count, price_total)
+            SELECT {bucket.format(column='p.prediction_date')}, COALESCE(c.brand, ''),
+                   COALESCE(p.state, ''), p.city, COUNT(*), SUM(p.predicted_price)
+            FROM predictions p
+            LEFT JOIN cars c ON p.car_id = c.id
+            GROUP BY 1, 2, 3, 4
+        ''')
+
+def migrate_prediction_rollups(cursor):
+    """Daily and monthly prediction counts and price totals per brand, state and city"""
+    for table, (period, bucket) in ROLLUP_PERIODS.items():
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                {period} VARCHAR(10) NOT NULL,
+                brand VARCHAR(50) NOT NULL,
+                state VARCHAR(50) NOT NULL,
+                city VARCHAR(50) NOT NULL,
+                prediction_count INTEGER NOT NULL DEFAULT 0,
+                price_total INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY ({period}, brand, state, city)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_predictions_{table}
+            AFTER INSERT ON predictions
+            BEGIN
+                INSERT INTO {table} ({period}, brand, state, city, prediction_count, price_total)
+                VALUES ({bucket.format(column='NEW.prediction_date')},
+                        COALESCE((SELECT brand FROM cars WHERE id = NEW.car_id), ''),
+                        COALESCE(NEW.state, ''), NEW.city, 1, NEW.predicted_price)
+                ON CONFLICT ({period}, brand, state, city) DO UPDATE SET
+                    prediction_count = prediction_count + 1,
+                    price_total = price_total + excluded.price_total;
+            END
+        ''')
+    rebuild_prediction_rollups(cursor)
+
+def rebuild_rollups(conn=None):
+    """Backfill every summary table (user stats and analytics rollups) from scratch"""
+    own_connection = conn is None
+    if own_connection:
+        conn = create_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        cursor = conn.cursor()
+        rebuild_user_stats(cursor)
+        rebuild_prediction_rollups(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if own_connection:
+            conn.close()
+
+def migrate_catalog_version(cursor):
+    """Single-row counter bumped by triggers on every write to cars"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1)')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_cars_{event.lower()}_catalog_version
+            AFTER {event} ON cars
+            BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+
+def get_catalog_version(conn):
+    """Current version of the cars table, changed by every insert, update or delete"""
+    row = conn.execute('SELECT version FROM catalog_version WHERE id = 1').fetchone()
+    return row['version'] if row else 0
+
+# Schema migrations, applied in version order and recorded in schema_migrations.
+# Each entry is (version, description, list of SQL statements or a function taking a cursor).
+# Never edit an applied migration; append a new one instead.
+MIGRATIONS = [
+    (1, 'Add state and area_type to predictions', migrate_prediction_location),
+    (2, 'Index predictions, invoices and cars lookups', [
+        'CREATE INDEX IF NOT EXISTS idx_predictions_user_date ON predictions (user_id, prediction_date)',
+        'CREATE INDEX IF NOT EXISTS idx_predictions_car ON predictions (car_id)',
+        'CREATE INDEX IF NOT EXISTS idx_invoices_prediction ON invoices (prediction_id)',
+        'CREATE INDEX IF NOT EXISTS idx_invoices_user ON invoices (user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_cars_brand_model ON cars (brand, model)'
+    ]),
+    (3, 'Add user_stats summary table', migrate_user_stats),
+    (4, 'Add daily and monthly prediction rollups for analytics', migrate_prediction_rollups),
+    (5, 'Add catalog_version counter for cars', migrate_catalog_version),
+    (6, 'Index cars by fuel type and transmission for the catalog API', [
+        'CREATE INDEX IF NOT EXISTS idx_cars_fuel_transmission ON cars (fuel_type, transmission, brand, model)'
+    ]),
+    (7, 'Store the price breakdown with each prediction', [
+        'ALTER TABLE predictions ADD COLUMN price_breakdown TEXT'
+    ])
+]
+
+def run_migrations(conn=None):
+    """Apply pending schema migrations, returning the versions that were applied"""
+    own_connection = conn is None
+    if own_connection:
+        conn = create_connection()
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR(200) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    applied = []
+    try:
+        for version, description, migration in MIGRATIONS:
+            # Take the write lock first so concurrent processes can't both apply it
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                done = conn.execute(
+                    'SELECT 1 FROM schema_migrations WHERE version = ?', (version,)
+                ).fetchone()
+                if not done:
+                    cursor = conn.cursor()
+                    if callable(migration):
+                        migration(cursor)
+                    else:
+                        for statement in migration:
+                            cursor.execute(statement)
+                    cursor.execute(
+                        'INSERT INTO schema_migrations (version, description) VALUES (?, ?)',
+                        (version, description)
+                    )
+                    applied.append(version)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        if own_connection:
+            conn.close()
+    
+    return applied
+
+def create_connection():
+    """Open a new connection and apply the per-connection settings"""
+    # Pooled connections move between request threads, one request at a time
+    conn = sqlite3.connect(DATABASE_PATH, timeout=CONNECTION_PRAGMAS['busy_timeout'] / 1000,
+                           check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    for pragma, value in CONNECTION_PRAGMAS.items():
+        conn.execute(f'PRAGMA {pragma} = {value}')
     return conn
 
+# Values PRAGMA queries report as numbers rather than the names they were set with
+PRAGMA_VALUE_NAMES = {
+    'synchronous': {'OFF': 0, 'NORMAL': 1, 'FULL': 2, 'EXTRA': 3},
+    'temp_store': {'DEFAULT': 0, 'FILE': 1, 'MEMORY': 2}
+}
+PRAGMA_BOOLEAN_NAMES = {'ON': 1, 'TRUE': 1, 'YES': 1, 'OFF': 0, 'FALSE': 0, 'NO': 0}
+
+def check_connection_pragmas():
+    """Read the settings back from a fresh connection.
+    
+    Returns (active, mismatches): active is {pragma: value in effect} for every
+    CONNECTION_PRAGMAS entry, and mismatches is {pragma: (configured, actual)} for
+    those SQLite did not apply as configured (e.g. mmap_size capped at compile time,
+    or WAL unavailable on the filesystem).
+    """
+    conn = create_connection()
+    try:
+        active = {}
+        mismatches = {}
+        for pragma, value in CONNECTION_PRAGMAS.items():
+            row = conn.execute(f'PRAGMA {pragma}').fetchone()
+            actual = row[0] if row else None
+            active[pragma] = actual
+            expected = value
+            if isinstance(value, str):
+                names = PRAGMA_VALUE_NAMES.get(pragma, PRAGMA_BOOLEAN_NAMES)
+                expected = names.get(value.upper(), value)
+            if str(actual).lower() != str(expected).lower():
+                mismatches[pragma] = (value, actual)
+        return active, mismatches
+    finally:
+        conn.close()
+
+class ConnectionPool:
+    """Bounded pool of idle connections shared by the worker threads of one process"""
+    
+    def __init__(self, max_size=POOL_SIZE):
+        self.max_size = max_size
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=max_size)
+    
+    def acquire(self):
+        """Take an idle connection, or open a new one if none is available"""
+        if self._pid != os.getpid():
+            # Connections must not be shared with a forked parent
+            self._pid = os.getpid()
+            self._idle = queue.LifoQueue(maxsize=self.max_size)
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return create_connection()
+    
+    def release(self, conn):
+        """Return a connection to the pool, closing it if the pool is full"""
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+class RequestConnection:
+    """The connection bound to the current app context.
+    
+    Route code calls close() when it is done, as with a plain connection; the real
+    connection goes back to the pool when the app context is torn down.
+    """
+    
+    def __init__(self, conn):
+        self._conn = conn
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    def close(self):
+        pass
+
+_pool = None
+
+def init_app(app, pool_size=POOL_SIZE):
+    """Bind get_db_connection to the app context of a Flask app
+    
+    Reads the optional DATABASE (file path) and SQLITE_PRAGMAS (dict merged over
+    CONNECTION_PRAGMAS) config keys.
+    """
+    global _pool, DATABASE_PATH
+    DATABASE_PATH = app.config.get('DATABASE', DATABASE_PATH)
+    CONNECTION_PRAGMAS.update(app.config.get('SQLITE_PRAGMAS', {}))
+    _pool = ConnectionPool(pool_size)
+    if 'database' not in app.extensions:
+        app.teardown_appcontext(release_db_connection)
+    app.extensions['database'] = _pool
+
+def release_db_connection(exception=None):
+    """Hand the app context's connection back to the pool"""
+    from flask import g
+    
+    request_conn = g.pop('db_conn', None)
+    if request_conn is not None:
+        _pool.release(request_conn._conn)
+
+def get_db_connection():
+    """Get database connection
+    
+    Inside an app context of an app passed to init_app, every call returns the same
+    pooled connection; elsewhere (CLI, scripts) a fresh connection the caller closes.
+    """
+    if _pool is not None:
+        # Flask is imported here, not at module level, so the CLI and the render
+        # workers (via invoice_generator) can import this module without it; _pool
+        # is only set by init_app, so Flask is already loaded at this point
+        from flask import g, has_app_context
+        
+        if has_app_context():
+            if 'db_conn' not in g:
+                g.db_conn = RequestConnection(_pool.acquire())
+            return g.db_conn
+    return create_connection()
+
 if __name__ == '__main__':
-    init_database()
+    import sys
+    
+    if sys.argv[1:] == ['rebuild-rollups']:
+        rebuild_rollups()
+        print("Summary tables rebuilt successfully!")
+    else:
+        init_database()
@@ -1,145 +1,144 @@
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from datetime import datetime
+from database import parse_db_timestamp
+import io
 import os
 
+# Styles are built once at import and shared by every render
+STYLES = getSampleStyleSheet()
+
+PRICE_STYLE = ParagraphStyle(
+    'PriceStyle',
+    parent=STYLES['Normal'],
+    fontSize=18,
+    textColor=colors.HexColor('#27ae60'),
+    alignment=1  # Center alignment
+)
+
+DETAILS_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+])
+
+CAR_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f8f9fa')),
+])
+
+# Page layout of the downloadable invoice: the margins leave room for the static
+# header and footer that draw_invoice_page stamps on every page
+PAGE_MARGINS = {'rightMargin': 72, 'leftMargin': 72, 'topMargin': 140, 'bottomMargin': 90}
+
+FOOTER_LINES = [
+    ('Helvetica-Bold', 'Car Price Predictor'),
+    ('Helvetica', 'Thank you for using our service!'),
+    ('Helvetica', 'This prediction is based on current market conditions and provided information.')
+]
+
+def draw_invoice_page(canvas, doc):
+    """Page template callback for the static header and footer.
+    
+    They are recorded once per document as a PDF form XObject and every page just
+    references it, so the page chrome is laid out and stored only once.
+    """
+    if not getattr(doc, 'page_form_drawn', False):
+        width, height = doc.pagesize
+        canvas.beginForm('invoice_page')
+        
+        # Header
+        canvas.setFillColor(colors.HexColor('#2c3e50'))
+        canvas.setFont('Helvetica-Bold', 24)
+        canvas.drawString(doc.leftMargin, height - 72 - 24, 'Car Price Predictor')
+        canvas.setFillColor(colors.black)
+        canvas.setFont('Helvetica-Bold', 14)
+        canvas.drawString(doc.leftMargin, height - 72 - 52, 'Price Prediction Invoice')
+        
+        # Footer
+        y = 36 + 14 * (len(FOOTER_LINES) - 1)
+        for font, text in FOOTER_LINES:
+            canvas.setFont(font, 10)
+            canvas.drawCentredString(width / 2, y, text)
+            y -= 14
+        
+        canvas.endForm()
+        doc.page_form_drawn = True
+    
+    canvas.doForm('invoice_page')
+
 class InvoiceGenerator:
+    """Renders invoice PDFs; every invoice PDF in the app is built here"""
+    
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self.title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            textColor=colors.HexColor('#2c3e50'),
-            alignment=1  # Center alignment
-        )
-        
-    def generate_pdf_invoice(self, invoice_data, filename=None):
-        """Generate PDF invoice"""
-        if not filename:
-            filename = f"invoice_{invoice_data['invoice_number']}.pdf"
-        
-        # Create the PDF document
-        doc = SimpleDocTemplate(filename, pagesize=A4)
+        self.styles = STYLES
+    
+    def build_story(self, invoice):
+        """Build the flowables of the downloadable invoice for an invoice row dict"""
         story = []
         
-        # Title
-        title = Paragraph("CAR PRICE PREDICTOR", self.title_style)
-        story.append(title)
-        story.append(Spacer(1, 20))
-        
-        # Invoice header
-        invoice_header = Paragraph(f"<b>Invoice #{invoice_data['invoice_number']}</b>", self.styles['Heading2'])
-        story.append(invoice_header)
-        story.append(Spacer(1, 10))
-        
-        # Date
-        date_para = Paragraph(f"Date: {datetime.now().strftime('%B %d, %Y')}", self.styles['Normal'])
-        story.append(date_para)
-        story.append(Spacer(1, 20))
-        
-        # Customer details
-        customer_header = Paragraph("<b>Bill To:</b>", self.styles['Heading3'])
-        story.append(customer_header)
-        
-        customer_details = f"""
-        {invoice_data['customer_name']}<br/>
-        Email: {invoice_data['customer_email']}<br/>
-        Phone: {invoice_data.get('customer_phone', 'N/A')}
-        """
-        customer_para = Paragraph(customer_details, self.styles['Normal'])
-        story.append(customer_para)
-        story.append(Spacer(1, 20))
-        
-        # Service details
-        service_header = Paragraph("<b>Service Details:</b>", self.styles['Heading3'])
-        story.append(service_header)
-        
-        # Create table for service details
-        service_data = [
-            ['Description', 'Details'],
-            ['Car', f"{invoice_data['car_brand']} {invoice_data['car_model']} ({invoice_data['car_year']})"],
-            ['Condition', invoice_data['car_condition'].title()],
-            ['Kilometers Driven', f"{invoice_data['kilometers_driven']:,} km"],
-            ['City', invoice_data['city'].title()],
-            ['Predicted Price', f"₹{invoice_data['predicted_price']:,}"],
+        # Invoice details; the date is the invoice's own so a render never goes stale
+        generated_at = parse_db_timestamp(invoice['generated_at']) or datetime.now()
+        invoice_data = [
+            ['Invoice ID:', f"INV-{invoice['id']:06d}"],
+            ['Date:', generated_at.strftime('%d %B %Y')],
+            ['Customer:', invoice['username']],
+            ['Email:', invoice['email']],
         ]
         
-        service_table = Table(service_data, colWidths=[2*inch, 3*inch])
-        service_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        story.append(service_table)
+        invoice_table = Table(invoice_data, colWidths=[2*inch, 4*inch])
+        invoice_table.setStyle(DETAILS_TABLE_STYLE)
+        story.append(invoice_table)
         story.append(Spacer(1, 30))
         
-        # Billing details
-        billing_header = Paragraph("<b>Billing Summary:</b>", self.styles['Heading3'])
-        story.append(billing_header)
-        
-        billing_data = [
-            ['Item', 'Amount'],
-            ['Car Price Prediction Service', f"₹{invoice_data['service_charge']:,}"],
-            ['Total Amount', f"₹{invoice_data['total_amount']:,}"],
+        # Car details
+        story.append(Paragraph("Car Details", self.styles['Heading3']))
+        car_data = [
+            ['Brand:', invoice['brand']],
+            ['Model:', invoice['model']],
+            ['Year:', str(invoice['year'])],
+            ['Age:', f"{invoice['car_age']} years"],
+            ['Condition:', invoice['car_condition'].title()],
+            ['Kilometers:', f"{invoice['kilometers_driven']:,} km"],
+            ['Location:', f"{invoice['city']}, {invoice['state']}"],
         ]
         
-        billing_table = Table(billing_data, colWidths=[3*inch, 2*inch])
-        billing_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e74c3c')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('FONTSIZE', (0, -1), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -2), colors.lightgrey),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f39c12')),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
+        car_table = Table(car_data, colWidths=[2*inch, 4*inch])
+        car_table.setStyle(CAR_TABLE_STYLE)
+        story.append(car_table)
+        story.append(Spacer(1, 30))
         
-        story.append(billing_table)
-        story.append(Spacer(1, 40))
+        # Price details
+        story.append(Paragraph("Price Prediction", self.styles['Heading3']))
+        story.append(Paragraph(f"Predicted Price: ₹{invoice['predicted_price']:,}", PRICE_STYLE))
         
-        # Footer
-        footer_text = """
-        <b>Thank you for using Car Price Predictor!</b><br/>
-        This invoice is for price prediction services only.<br/>
-        For any queries, please contact us at support@carpredictor.com
-        """
-        footer_para = Paragraph(footer_text, self.styles['Normal'])
-        story.append(footer_para)
+        return story
+    
+    def render(self, invoices, output):
+        """Render invoices into one PDF, each starting on a new page, written to a path or file object"""
+        doc = SimpleDocTemplate(output, pagesize=A4, **PAGE_MARGINS)
+        
+        story = []
+        for invoice in invoices:
+            if story:
+                story.append(PageBreak())
+            story.extend(self.build_story(invoice))
         
-        # Build PDF
-        doc.build(story)
-        return filename
+        doc.build(story, onFirstPage=draw_invoice_page, onLaterPages=draw_invoice_page)
     
-    def prepare_invoice_data(self, invoice_row):
-        """Prepare invoice data from database row"""
-        return {
-            'invoice_number': invoice_row['invoice_number'],
-            'customer_name': invoice_row['full_name'],
-            'customer_email': invoice_row['email'],
-            'customer_phone': invoice_row.get('phone', 'N/A'),
-            'car_brand': invoice_row['brand'],
-            'car_model': invoice_row['model'],
-            'car_year': invoice_row['year'],
-            'car_condition': invoice_row['car_condition'],
-            'kilometers_driven': invoice_row['kilometers_driven'],
-            'city': invoice_row['city'],
-            'predicted_price': invoice_row['predicted_price'],
-            'service_charge': invoice_row['service_charge'],
-            'total_amount': invoice_row['total_amount']
-        }
+    def render_to_bytes(self, invoice):
+        """Render the downloadable invoice PDF for an invoice row dict in memory"""
+        buffer = io.BytesIO()
+        try:
+            self.render([invoice], buffer)
+            return buffer.getvalue()
+        finally:
+            buffer.close()
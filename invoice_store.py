@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import tempfile
+
+INVOICE_CACHE_DIR = 'invoice_cache'
+
+# Bump when the invoice PDF layout changes so cached files get re-rendered
+PDF_LAYOUT_VERSION = 2
+
+class InvoicePdfStore:
+    """Content-addressed on-disk store of rendered invoice PDFs.
+
+    Files are named <invoice id>-<data hash>.pdf, where the hash covers every field
+    the PDF is rendered from, so a cached file is valid for as long as its name matches.
+    A failed render leaves a <invoice id>-<data hash>.error file with the error message
+    instead, so every web worker process sharing the directory can see it.
+    """
+
+    def __init__(self, directory=INVOICE_CACHE_DIR):
+        self.directory = os.path.abspath(directory)
+
+    @staticmethod
+    def digest(invoice):
+        """Hash of the invoice data (plus layout version) a PDF is rendered from"""
+        payload = json.dumps(
+            {'layout': PDF_LAYOUT_VERSION, 'invoice': invoice},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path_for(self, invoice_id, digest):
+        """Path of the cached PDF for an invoice id and data hash"""
+        return os.path.join(self.directory, f'{invoice_id}-{digest}.pdf')
+
+    def get(self, invoice_id, digest):
+        """Path of the cached PDF, or None if it hasn't been rendered yet"""
+        path = self.path_for(invoice_id, digest)
+        return path if os.path.exists(path) else None
+
+    def error_path_for(self, invoice_id, digest):
+        """Path of the failure marker for an invoice id and data hash"""
+        return os.path.join(self.directory, f'{invoice_id}-{digest}.error')
+
+    def get_error(self, invoice_id, digest):
+        """Error message of a failed render, or None if there is no failure on record"""
+        try:
+            with open(self.error_path_for(invoice_id, digest), encoding='utf-8') as error_file:
+                return error_file.read()
+        except FileNotFoundError:
+            return None
+
+    def put_error(self, invoice_id, digest, message):
+        """Record that rendering failed, until the next put() or clear_error()"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(self.error_path_for(invoice_id, digest), str(message).encode('utf-8'))
+
+    def clear_error(self, invoice_id, digest):
+        """Forget a failed render, e.g. before retrying it"""
+        try:
+            os.unlink(self.error_path_for(invoice_id, digest))
+        except FileNotFoundError:
+            pass
+
+    def _write(self, path, data):
+        """Write data to path atomically"""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+
+    def put(self, invoice_id, digest, pdf_data):
+        """Store a rendered PDF atomically and drop older renders and failures of the same invoice"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(invoice_id, digest)
+        self._write(path, pdf_data)
+
+        prefix = f'{invoice_id}-'
+        for name in os.listdir(self.directory):
+            if (name.startswith(prefix) and name.endswith(('.pdf', '.error'))
+                    and name != os.path.basename(path)):
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+        return path
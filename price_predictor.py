@@ -1,8 +1,380 @@
 import random
-from database import get_db_connection
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from database import get_db_connection, get_catalog_version
+
+# Seconds between checks of the database's catalog version, which picks up cars
+# written by other worker processes
+CATALOG_CHECK_INTERVAL = 5
+
+# Ages (in years) covered by the precomputed per-age tables; older cars fall back to the formulas
+MAX_TABLE_AGE = 50
+
+# Mileage rule: 15,000 km a year is expected, each km under that adds 5% per 100,000 km and
+# each km over it takes off 10% per 50,000 km, up to a 30% penalty
+EXPECTED_KM_PER_YEAR = 15000
+LOW_MILEAGE_BONUS_PER_KM = 0.05 / 100000
+HIGH_MILEAGE_PENALTY_PER_KM = 0.1 / 50000
+MAX_MILEAGE_PENALTY = 0.3
+
+def depreciation_factor(car_age):
+    """Share of the base price left after car_age years - more realistic rates"""
+    if car_age == 0:
+        return 1.0
+    elif car_age == 1:
+        return 0.85  # 15% first year depreciation
+    elif car_age <= 3:
+        return 0.85 * ((1 - 0.08) ** (car_age - 1))  # 8% per year for years 2-3
+    elif car_age <= 5:
+        return 0.85 * (0.92 ** 2) * ((1 - 0.06) ** (car_age - 3))  # 6% per year for years 4-5
+    else:
+        # 4% per year after 5 years
+        return 0.85 * (0.92 ** 2) * (0.94 ** 2) * ((1 - 0.04) ** (car_age - 5))
+
+def market_price_percentage(car_age):
+    """Market price percentage: 85-115% of the calculated price based on age"""
+    return 0.85 + (0.30 * (1 - (car_age / 25)))
+
+# Market demand factor: ±10% around the computed price
+MARKET_FACTOR_MIN = 0.90
+MARKET_FACTOR_SPAN = 0.20
+
+# 'daily' derives the market factor from a hash of the normalized inputs, the UTC day and a
+# seed, so identical requests on the same day get the same price; 'random' draws a fresh
+# factor on every call
+MARKET_FACTOR_MODES = ('daily', 'random')
+DEFAULT_MARKET_SEED = 0
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MASK64 = (1 << 64) - 1
+
+# Odd 64-bit multipliers packing (car id, age, condition, km, state, city) into one word
+MARKET_HASH_MULTIPLIERS = (
+    0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+    0xD6E8FEB86659FD93, 0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53
+)
+
+def mix64(z):
+    """splitmix64 finalizer: scramble a 64-bit integer"""
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+def market_day(when=None):
+    """UTC day number (days since 1970-01-01) of a date or datetime, or of today"""
+    if when is None:
+        return int(time.time() // 86400)
+    if isinstance(when, datetime):
+        when = when.date()
+    return when.toordinal() - EPOCH_ORDINAL
+
+def market_day_key(day, seed=DEFAULT_MARKET_SEED):
+    """Per-day hash key that every market factor of that day is derived from"""
+    return mix64((seed * MARKET_HASH_MULTIPLIERS[0] + day) & MASK64)
+
+def market_hash_factor(z):
+    """Market factor in [0.90, 1.10) of a packed 64-bit input word (see market_factor)"""
+    # mix64, inlined on this hot path
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    z ^= z >> 31
+    return MARKET_FACTOR_MIN + MARKET_FACTOR_SPAN * ((z >> 11) * 2.0 ** -53)
+
+def market_factor(day_key, car_id, car_age, condition_code, kilometers_driven, state_code, city_code):
+    """Deterministic market factor in [0.90, 1.10) for normalized inputs"""
+    m1, m2, m3, m4, m5, m6 = MARKET_HASH_MULTIPLIERS
+    z = (day_key + int(car_id) * m1 + int(car_age) * m2 + condition_code * m3
+         + int(kilometers_driven) * m4 + state_code * m5 + city_code * m6) & MASK64
+    return market_hash_factor(z)
+
+def market_factors(day_key, car_ids, car_ages, condition_codes, kilometers_driven, state_codes, city_codes):
+    """Vectorized market_factor over int64 arrays, giving bit-identical results"""
+    import numpy as np
+    
+    def mix(z):
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+    
+    # uint64 arithmetic wraps modulo 2**64 like the masked Python version
+    columns = (car_ids, car_ages, condition_codes, kilometers_driven.astype(np.int64), state_codes, city_codes)
+    z = np.full(len(car_ids), day_key, dtype=np.uint64)
+    for column, multiplier in zip(columns, MARKET_HASH_MULTIPLIERS):
+        z += column.astype(np.uint64) * np.uint64(multiplier)
+    z = mix(z)
+    return MARKET_FACTOR_MIN + MARKET_FACTOR_SPAN * ((z >> np.uint64(11)).astype(np.float64) * 2.0 ** -53)
+
+# Predictions kept by PredictionCache
+PREDICTION_CACHE_SIZE = 20000
+
+class PredictionCache:
+    """Bounded LRU cache of predicted prices keyed by normalized inputs.
+    
+    Entries live for one market factor period: they only match lookups for the
+    same period (the UTC day's market key), and the cache is emptied when the
+    first price of a new period is stored. hits and misses are counted for
+    monitoring; without the lock on hits they are approximate under threads.
+    """
+    
+    def __init__(self, max_size=PREDICTION_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._period = None
+        self._prices = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, period, key):
+        # Hits don't take the lock: each OrderedDict call is atomic under the GIL,
+        # and a key evicted between the two calls is just a miss
+        if period == self._period:
+            price = self._prices.get(key)
+            if price is not None:
+                try:
+                    self._prices.move_to_end(key)
+                except KeyError:
+                    pass
+                self.hits += 1
+                return price
+        self.misses += 1
+        return None
+    
+    def put(self, period, key, price):
+        with self._lock:
+            if period != self._period:
+                # A new period: everything cached so far is out of date
+                self._prices.clear()
+                self._period = period
+            self._prices[key] = price
+            if len(self._prices) > self.max_size:
+                self._prices.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._prices.clear()
+    
+    def stats(self):
+        """Size and counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._prices),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions
+            }
+
+# Distinct raw spellings (e.g. 'Mumbai', 'MUMBAI ') a plan remembers the code of
+MAX_CACHED_NAMES = 4096
+
+class PricingPlan:
+    """Pricing factors of one catalog snapshot, compiled for fast repeated predictions.
+    
+    Condition, state and city names are normalized once into integer codes (0 means
+    "not in the table" and carries the default multiplier). Factors that never change
+    for a car (base price x fuel x transmission) or a location (state x city) are
+    pre-multiplied, so a prediction is a few table lookups and multiplies. Cars and
+    locations stay separate tables because a dense car x state x city array would
+    grow with the product of all three.
+    
+    The market factor's hash terms (see market_factor) are precomputed the same way,
+    so only the km term is multiplied per prediction before the final mix.
+    """
+    
+    def __init__(self, predictor, catalog, catalog_version=None):
+        self.catalog = catalog
+        self.catalog_version = catalog_version
+        self.car_factors = {
+            car_id: car['base_price']
+                    * predictor.fuel_type_adjustments.get(car['fuel_type'].lower(), 1.0)
+                    * predictor.transmission_adjustments.get(car['transmission'].lower(), 1.0)
+            for car_id, car in catalog.items()
+        }
+        
+        self.condition_codes, self.condition_factors = self._compile(predictor.condition_multipliers, 0.7)
+        self.state_codes, self.state_factors = self._compile(predictor.state_multipliers, 0.92)
+        self.city_codes, self.city_factors = self._compile(predictor.city_adjustments, 1.0)
+        self.location_factors = [[state * city for city in self.city_factors] for state in self.state_factors]
+        
+        # Per-age (depreciation factor x market price percentage, expected km)
+        self.age_factors = [(factor * percentage, expected_km)
+                            for factor, percentage, expected_km in predictor.age_table]
+        
+        # market_factor's per-input terms, reduced modulo 2**64
+        m1, m2, m3, m4, m5, m6 = MARKET_HASH_MULTIPLIERS
+        self.car_hash_terms = {car_id: (car_id * m1) & MASK64 for car_id in catalog}
+        self.age_hash_terms = [(car_age * m2) & MASK64 for car_age in range(len(self.age_factors))]
+        self.condition_hash_terms = [(code * m3) & MASK64 for code in range(len(self.condition_factors))]
+        self.location_hash_terms = [[(state_code * m5 + city_code * m6) & MASK64
+                                     for city_code in range(len(self.city_factors))]
+                                    for state_code in range(len(self.state_factors))]
+        self.predictor = predictor
+        self._arrays = None
+    
+    @staticmethod
+    def _compile(table, default):
+        """Name -> code mapping and the code-indexed factor list for a multiplier table"""
+        codes = {name: code for code, name in enumerate(table, 1)}
+        return codes, [default] + list(table.values())
+    
+    @staticmethod
+    def _code(codes, name):
+        code = codes.get(name)
+        if code is None:
+            code = codes.get(str(name).lower(), 0)
+            if len(codes) < MAX_CACHED_NAMES:
+                codes[name] = code
+        return code
+    
+    def condition_code(self, condition):
+        return self._code(self.condition_codes, condition)
+    
+    def state_code(self, state):
+        return self._code(self.state_codes, state)
+    
+    def city_code(self, city):
+        return self._code(self.city_codes, city)
+    
+    def encode(self, car_id, car_age, condition, kilometers_driven, state, city):
+        """Normalize inputs to (car id, age, condition code, km, state code, city code).
+        
+        Returns None if the car isn't in the catalog.
+        """
+        if car_id not in self.car_factors:
+            try:
+                car_id = int(car_id)
+            except (TypeError, ValueError):
+                return None
+            if car_id not in self.car_factors:
+                return None
+        
+        # Already-seen spellings resolve with one dict lookup each
+        condition_code = self.condition_codes.get(condition)
+        if condition_code is None:
+            condition_code = self.condition_code(condition)
+        state_code = self.state_codes.get(state)
+        if state_code is None:
+            state_code = self.state_code(state)
+        city_code = self.city_codes.get(city)
+        if city_code is None:
+            city_code = self.city_code(city)
+        return car_id, car_age, condition_code, kilometers_driven, state_code, city_code
+    
+    def price(self, inputs, market_key=None):
+        """Final rounded price for encoded inputs.
+        
+        The market factor is derived from market_key (see market_day_key), or drawn at
+        random when it is None.
+        """
+        car_id, car_age, condition_code, kilometers_driven, state_code, city_code = inputs
+        
+        if isinstance(car_age, int) and 0 <= car_age <= MAX_TABLE_AGE:
+            age_factor, expected_km = self.age_factors[car_age]
+            age_hash = self.age_hash_terms[car_age]
+        else:
+            factor, percentage, expected_km = self.predictor.get_age_factors(car_age)
+            age_factor = factor * percentage
+            age_hash = int(car_age) * MARKET_HASH_MULTIPLIERS[1]
+        
+        if kilometers_driven <= expected_km:
+            mileage_multiplier = 1.0 + (expected_km - kilometers_driven) * LOW_MILEAGE_BONUS_PER_KM
+        else:
+            mileage_multiplier = 1.0 - min((kilometers_driven - expected_km) * HIGH_MILEAGE_PENALTY_PER_KM,
+                                           MAX_MILEAGE_PENALTY)
+        
+        if market_key is None:
+            market = random.uniform(MARKET_FACTOR_MIN, MARKET_FACTOR_MIN + MARKET_FACTOR_SPAN)
+        else:
+            market = market_hash_factor(
+                (market_key + self.car_hash_terms[car_id] + age_hash + self.condition_hash_terms[condition_code]
+                 + int(kilometers_driven) * MARKET_HASH_MULTIPLIERS[3]
+                 + self.location_hash_terms[state_code][city_code]) & MASK64
+            )
+        
+        price = (self.car_factors[car_id] * age_factor * self.condition_factors[condition_code]
+                 * mileage_multiplier * self.location_factors[state_code][city_code] * market)
+        
+        # Round to nearest thousand, minimum price of ₹50,000
+        return max(int(round(price / 1000) * 1000), 50000)
+    
+    def breakdown(self, inputs, price):
+        """Step-by-step trace of how encoded inputs were priced, ending in the final price"""
+        car_id, car_age, condition_code, kilometers_driven, state_code, city_code = inputs
+        car = self.catalog[car_id]
+        depreciation, _, expected_km = self.predictor.get_age_factors(car_age)
+        
+        breakdown = {
+            'base_price': car['base_price'],
+            'car_details': {
+                'brand': car['brand'],
+                'model': car['model'],
+                'year': car['year'],
+                'fuel_type': car['fuel_type'],
+                'transmission': car['transmission']
+            }
+        }
+        current_price = car['base_price']
+        
+        if car_age > 0:
+            depreciated_price = current_price * depreciation
+            breakdown['depreciation'] = {
+                'amount': current_price - depreciated_price,
+                'percentage': car['depreciation_rate'] * 100,
+                'price_after': depreciated_price
+            }
+            current_price = depreciated_price
+        
+        steps = [
+            ('condition', self.condition_factors[condition_code]),
+            ('mileage', self.predictor.mileage_multiplier(kilometers_driven, expected_km)),
+            ('state', self.state_factors[state_code]),
+            ('city', self.city_factors[city_code])
+        ]
+        for step, multiplier in steps:
+            adjusted_price = current_price * multiplier
+            breakdown[step] = {
+                'multiplier': multiplier,
+                'adjustment': adjusted_price - current_price,
+                'price_after': adjusted_price
+            }
+            current_price = adjusted_price
+        
+        breakdown['final_price'] = price
+        return breakdown
+    
+    def arrays(self):
+        """The plan as numpy arrays for predict_batch, built on first use"""
+        if self._arrays is None:
+            import numpy as np
+            
+            ids = sorted(self.car_factors)
+            self._arrays = {
+                'ids': np.array(ids, dtype=np.int64),
+                'car_factor': np.array([self.car_factors[car_id] for car_id in ids], dtype=np.float64),
+                'condition_factor': np.array(self.condition_factors, dtype=np.float64),
+                'location_factor': np.array(self.location_factors, dtype=np.float64),
+                'age_factor': np.array(self.age_factors, dtype=np.float64)
+            }
+        return self._arrays
+    
+    def encode_column(self, values, codes, encoder):
+        """Integer codes for a sequence of names; only spellings not seen before go through encoder"""
+        import numpy as np
+        
+        lookup = codes.get
+        encoded = np.array([lookup(name, -1) for name in values], dtype=np.int64)
+        for position in np.flatnonzero(encoded < 0):
+            encoded[position] = encoder(values[position])
+        return encoded
 
 class CarPricePredictor:
-    def __init__(self):
+    def __init__(self, cache_size=PREDICTION_CACHE_SIZE):
         # State-based multipliers for market demand
         self.state_multipliers = {
             'maharashtra': 1.15,
@@ -93,174 +465,280 @@ class CarPricePredictor:
             'dsg': 1.15,
             'amt': 1.05
         }
+        
+        # In-process copy of the cars table keyed by id, loaded on first use
+        self._car_catalog = None
+        self._catalog_lock = threading.Lock()
+        self._pricing_plan = None
+        self.market_mode = 'daily'
+        self.market_seed = DEFAULT_MARKET_SEED
+        # (time it expires, key) of today's market key
+        self._today_market_key = (0.0, None)
+        
+        # Deterministic ('daily' mode) prices by normalized inputs; cache_size=0 disables it
+        self.prediction_cache = PredictionCache(cache_size) if cache_size else None
+        
+        # Per-age (depreciation factor, market price percentage, expected km) indexed by car
+        # age, shared by the scalar and batch paths
+        self.age_table = [
+            (depreciation_factor(age), market_price_percentage(age), age * EXPECTED_KM_PER_YEAR)
+            for age in range(MAX_TABLE_AGE + 1)
+        ]
+        self.catalog_version = None
+        self._catalog_checked_at = 0
 
-    def get_car_details(self, car_id):
-        """Get car details from database"""
+    def load_car_catalog(self):
+        """Load the whole cars table into the in-memory catalog"""
         conn = get_db_connection()
-        car_row = conn.execute('SELECT * FROM cars WHERE id = ?', (car_id,)).fetchone()
+        # Read the version first: a write landing in between only makes the next check reload
+        version = get_catalog_version(conn)
+        car_rows = conn.execute('SELECT * FROM cars').fetchall()
         conn.close()
-        return dict(car_row) if car_row else None
+        catalog = {car['id']: dict(car) for car in car_rows}
+        with self._catalog_lock:
+            self._car_catalog = catalog
+            self.catalog_version = version
+            self._catalog_checked_at = time.monotonic()
+        return catalog
+
+    def warm_up(self):
+        """Load the catalog and compile its pricing plan up front (e.g. before forking workers)"""
+        self.load_car_catalog()
+        self.get_pricing_plan().arrays()
+
+    def invalidate_car_catalog(self):
+        """Drop the cached catalog so the next lookup reloads it (call after writing to cars)"""
+        with self._catalog_lock:
+            self._car_catalog = None
+
+    def get_car_catalog(self):
+        """Get the cached catalog, loading it if needed"""
+        catalog = self._car_catalog
+        if catalog is None:
+            catalog = self.load_car_catalog()
+        return catalog
+
+    def get_catalog_version(self):
+        """Version of the cached catalog, reloading it if the cars table has changed.
+        
+        The database is only asked every CATALOG_CHECK_INTERVAL seconds, so callers
+        can use this on every request to key caches derived from the catalog.
+        """
+        self.get_car_catalog()
+        if time.monotonic() - self._catalog_checked_at >= CATALOG_CHECK_INTERVAL:
+            conn = get_db_connection()
+            version = get_catalog_version(conn)
+            conn.close()
+            self._catalog_checked_at = time.monotonic()
+            if version != self.catalog_version:
+                self.load_car_catalog()
+        return self.catalog_version
+
+    def get_car_details(self, car_id):
+        """Get car details from the in-memory catalog"""
+        try:
+            car_id = int(car_id)
+        except (TypeError, ValueError):
+            return None
+        
+        # Cars added by other processes show up within CATALOG_CHECK_INTERVAL
+        self.get_catalog_version()
+        car = self.get_car_catalog().get(car_id)
+        return dict(car) if car else None
+
+    def get_age_factors(self, car_age):
+        """(depreciation factor, market price percentage, expected km) for an age, from age_table when in range"""
+        # The table only covers whole years; fractional ages use the formulas
+        if isinstance(car_age, int) and 0 <= car_age <= MAX_TABLE_AGE:
+            return self.age_table[car_age]
+        return depreciation_factor(car_age), market_price_percentage(car_age), car_age * EXPECTED_KM_PER_YEAR
 
     def calculate_depreciation(self, base_price, car_age, depreciation_rate):
         """Calculate depreciation based on car age - more realistic rates"""
-        # More realistic depreciation rates
-        if car_age == 0:
-            return base_price
-        elif car_age == 1:
-            return base_price * 0.85  # 15% first year depreciation
-        elif car_age <= 3:
-            return base_price * 0.85 * ((1 - 0.08) ** (car_age - 1))  # 8% per year for years 2-3
-        elif car_age <= 5:
-            return base_price * 0.85 * (0.92 ** 2) * ((1 - 0.06) ** (car_age - 3))  # 6% per year for years 4-5
-        else:
-            # 4% per year after 5 years
-            return base_price * 0.85 * (0.92 ** 2) * (0.94 ** 2) * ((1 - 0.04) ** (car_age - 5))
+        return base_price * self.get_age_factors(car_age)[0]
 
     def calculate_mileage_adjustment(self, kilometers_driven, car_age):
         """Adjust price based on kilometers driven"""
-        if car_age == 0:
-            expected_km = 0
-        else:
-            expected_km = car_age * 15000  # Average 15,000 km per year
-        
-        actual_km = kilometers_driven
-        
-        if actual_km <= expected_km:
+        return self.mileage_multiplier(kilometers_driven, self.get_age_factors(car_age)[2])
+
+    @staticmethod
+    def mileage_multiplier(kilometers_driven, expected_km):
+        """Mileage adjustment given the expected km for the car's age"""
+        if kilometers_driven <= expected_km:
             # Low mileage bonus
-            return 1.0 + (expected_km - actual_km) / 100000 * 0.05
-        else:
-            # High mileage penalty
-            excess_km = actual_km - expected_km
-            penalty = min(excess_km / 50000 * 0.1, 0.3)  # Max 30% penalty
-            return 1.0 - penalty
-
-    def predict_price(self, car_id, car_age, condition, kilometers_driven, state, city):
-        """Main price prediction function with state-city support"""
-        car = self.get_car_details(car_id)
-        if not car:
+            return 1.0 + (expected_km - kilometers_driven) * LOW_MILEAGE_BONUS_PER_KM
+        # High mileage penalty
+        return 1.0 - min((kilometers_driven - expected_km) * HIGH_MILEAGE_PENALTY_PER_KM, MAX_MILEAGE_PENALTY)
+
+    def configure_market(self, mode='daily', seed=DEFAULT_MARKET_SEED):
+        """Choose how the market factor is set: 'daily' (deterministic per day and seed) or 'random'"""
+        if mode not in MARKET_FACTOR_MODES:
+            raise ValueError(f"market mode must be one of {', '.join(MARKET_FACTOR_MODES)}")
+        self.market_mode = mode
+        self.market_seed = int(seed)
+        self._today_market_key = (0.0, None)
+
+    def get_market_key(self, market_date=None):
+        """Day key for the deterministic market factor (today's by default), or None in 'random' mode"""
+        if self.market_mode == 'random':
+            return None
+        if market_date is not None:
+            return market_day_key(market_day(market_date), self.market_seed)
+        expires_at, key = self._today_market_key
+        if time.time() >= expires_at:
+            day = market_day()
+            key = market_day_key(day, self.market_seed)
+            self._today_market_key = ((day + 1) * 86400, key)
+        return key
+
+    def get_pricing_plan(self):
+        """Pricing plan compiled from the current catalog, rebuilt when the catalog is reloaded"""
+        # Throttled check that picks up cars written by other processes (the time test
+        # is inlined: this runs on every prediction)
+        if time.monotonic() - self._catalog_checked_at >= CATALOG_CHECK_INTERVAL:
+            self.get_catalog_version()
+        plan = self._pricing_plan
+        if plan is None or plan.catalog is not self._car_catalog:
+            catalog = self.get_car_catalog()
+            if plan is not None and plan.catalog_version == self.catalog_version:
+                # Reloaded, but the cars table hasn't changed since the plan was built
+                plan.catalog = catalog
+                return plan
+            plan = PricingPlan(self, catalog, self.catalog_version)
+            self._pricing_plan = plan
+            # Cached prices were computed from the previous catalog
+            if self.prediction_cache is not None:
+                self.prediction_cache.clear()
+        return plan
+
+    def _predict(self, car_id, car_age, condition, kilometers_driven, state, city, market_date=None):
+        """(plan, encoded inputs, price) of a prediction, or None if the car isn't in the catalog"""
+        market_key = self.get_market_key(market_date)
+        plan = self.get_pricing_plan()
+        inputs = plan.encode(car_id, car_age, condition, kilometers_driven, state, city)
+        if inputs is None:
             return None
         
-        # Start with base price
-        base_price = car['base_price']
-        
-        # Apply depreciation
-        depreciated_price = self.calculate_depreciation(
-            base_price, car_age, car['depreciation_rate']
-        )
-        
-        # Apply condition multiplier
-        condition_adjusted = depreciated_price * self.condition_multipliers.get(
-            condition.lower(), 0.7
-        )
-        
-        # Apply mileage adjustment
-        mileage_adjusted = condition_adjusted * self.calculate_mileage_adjustment(
-            kilometers_driven, car_age
-        )
-        
-        # Apply state multiplier
-        state_multiplier = self.state_multipliers.get(state.lower(), 0.92)
-        state_adjusted = mileage_adjusted * state_multiplier
+        cache = self.prediction_cache
+        if cache is None or market_key is None or market_date is not None:
+            # Only today's prices are cached; past days are recomputed
+            return plan, inputs, plan.price(inputs, market_key)
         
-        # Apply city adjustment within state
-        city_adjustment = self.city_adjustments.get(city.lower(), 1.0)
-        city_adjusted = state_adjusted * city_adjustment
+        price = cache.get(market_key, inputs)
+        if price is None:
+            price = plan.price(inputs, market_key)
+            cache.put(market_key, inputs, price)
+        return plan, inputs, price
+
+    def predict_price(self, car_id, car_age, condition, kilometers_driven, state, city, market_date=None):
+        """Main price prediction function with state-city support.
         
-        # Apply fuel type adjustment
-        fuel_adjusted = city_adjusted * self.fuel_type_adjustments.get(
-            car['fuel_type'].lower(), 1.0
-        )
+        In 'daily' market mode the price is a pure function of the inputs and the UTC
+        day (market_date, default today), so it can be reproduced and cached.
+        """
+        result = self._predict(car_id, car_age, condition, kilometers_driven, state, city, market_date)
+        return result[2] if result else None
+
+    def predict_with_breakdown(self, car_id, car_age, condition, kilometers_driven, state, city, market_date=None):
+        """Predict a price and trace how it was reached in the same pass.
         
-        # Apply transmission adjustment
-        final_price = fuel_adjusted * self.transmission_adjustments.get(
-            car['transmission'].lower(), 1.0
-        )
+        Returns (price, breakdown), where breakdown is in get_price_breakdown's format
+        with final_price equal to price, or (None, None) if the car isn't in the catalog.
+        """
+        result = self._predict(car_id, car_age, condition, kilometers_driven, state, city, market_date)
+        if not result:
+            return None, None
+        plan, inputs, price = result
+        return price, plan.breakdown(inputs, price)
+
+    def batch_breakdowns(self, car_ids, car_ages, conditions, kilometers_driven, states, cities, prices):
+        """Breakdowns for rows already priced by predict_batch, in predict_with_breakdown's format.
         
-        # Add market price percentage and fluctuation
-        # Market demand factor based on current trends (±10%)
-        market_factor = random.uniform(0.90, 1.10)
+        Takes the same columns plus the prices; rows priced 0 (car not in the catalog)
+        get None.
+        """
+        plan = self.get_pricing_plan()
+        breakdowns = []
+        for car_id, car_age, condition, km, state, city, price in zip(
+                car_ids, car_ages, conditions, kilometers_driven, states, cities, prices):
+            inputs = plan.encode(car_id, car_age, condition, km, state, city) if price else None
+            breakdowns.append(plan.breakdown(inputs, int(price)) if inputs else None)
+        return breakdowns
+
+    def predict_batch(self, car_ids, car_ages, conditions, kilometers_driven, states, cities, rng=None,
+                      market_date=None):
+        """Vectorized predict_price over columnar inputs.
         
-        # Add market price percentage calculation
-        market_price_percentage = 0.85 + (0.30 * (1 - (car_age / 25)))  # 85-115% of calculated price based on age
+        Every argument is an array-like of equal length. Returns an int64 array of
+        prices; rows whose car_id is not in the catalog get 0. Prices match
+        predict_price in 'daily' market mode; passing a numpy Generator as rng draws
+        random market factors from it instead.
+        """
+        import numpy as np
         
-        final_price = final_price * market_factor * market_price_percentage
+        car_ids = np.asarray(car_ids, dtype=np.int64)
+        ages = np.asarray(car_ages, dtype=np.float64)
+        # Whole years for the market hash, truncated like int() in market_factor
+        car_ages = ages.astype(np.int64)
+        kilometers_driven = np.asarray(kilometers_driven, dtype=np.float64)
+        n = len(car_ids)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
         
-        # Round to nearest thousand
-        final_price = round(final_price / 1000) * 1000
+        # Resolve cars by binary search over the plan's sorted car ids
+        plan = self.get_pricing_plan()
+        arrays = plan.arrays()
+        ids = arrays['ids']
+        positions = np.searchsorted(ids, car_ids)
+        positions = np.minimum(positions, len(ids) - 1)
+        found = ids[positions] == car_ids
         
-        return max(int(final_price), 50000)  # Minimum price of ₹50,000
-
-    def get_price_breakdown(self, car_id, car_age, condition, kilometers_driven, state, city):
-        """Get detailed price breakdown for transparency"""
-        car = self.get_car_details(car_id)
-        if not car:
-            return None
+        # Per-age factors from the same table as the scalar path
+        in_table = (ages == car_ages) & (car_ages >= 0) & (car_ages <= MAX_TABLE_AGE)
+        age_factors = arrays['age_factor'][np.where(in_table, car_ages, 0)]
+        if not in_table.all():
+            outside = np.flatnonzero(~in_table)
+            age_factors[outside] = [
+                (factor * percentage, expected_km)
+                for factor, percentage, expected_km in map(self.get_age_factors, ages[outside].tolist())
+            ]
         
-        breakdown = {
-            'base_price': car['base_price'],
-            'car_details': {
-                'brand': car['brand'],
-                'model': car['model'],
-                'year': car['year'],
-                'fuel_type': car['fuel_type'],
-                'transmission': car['transmission']
-            }
-        }
+        # Mileage, same piecewise rule as calculate_mileage_adjustment
+        expected_km = age_factors[:, 1]
+        mileage_multiplier = np.where(
+            kilometers_driven <= expected_km,
+            1.0 + (expected_km - kilometers_driven) * LOW_MILEAGE_BONUS_PER_KM,
+            1.0 - np.minimum((kilometers_driven - expected_km) * HIGH_MILEAGE_PENALTY_PER_KM, MAX_MILEAGE_PENALTY)
+        )
         
-        # Calculate step by step
-        current_price = car['base_price']
+        condition_codes = plan.encode_column(conditions, plan.condition_codes, plan.condition_code)
+        state_codes = plan.encode_column(states, plan.state_codes, plan.state_code)
+        city_codes = plan.encode_column(cities, plan.city_codes, plan.city_code)
         
-        # Depreciation
-        if car_age > 0:
-            depreciated_price = self.calculate_depreciation(
-                current_price, car_age, car['depreciation_rate']
-            )
-            breakdown['depreciation'] = {
-                'amount': current_price - depreciated_price,
-                'percentage': car['depreciation_rate'] * 100,
-                'price_after': depreciated_price
-            }
-            current_price = depreciated_price
+        # Market demand factor
+        market_key = self.get_market_key(market_date)
+        if rng is None and market_key is not None:
+            market_factor = market_factors(market_key, car_ids, car_ages, condition_codes,
+                                           kilometers_driven, state_codes, city_codes)
+        else:
+            rng = rng or np.random.default_rng()
+            market_factor = rng.uniform(MARKET_FACTOR_MIN, MARKET_FACTOR_MIN + MARKET_FACTOR_SPAN, n)
         
-        # Condition
-        condition_multiplier = self.condition_multipliers.get(condition.lower(), 0.7)
-        condition_adjusted = current_price * condition_multiplier
-        breakdown['condition'] = {
-            'multiplier': condition_multiplier,
-            'adjustment': condition_adjusted - current_price,
-            'price_after': condition_adjusted
-        }
-        current_price = condition_adjusted
-        
-        # Mileage
-        mileage_multiplier = self.calculate_mileage_adjustment(kilometers_driven, car_age)
-        mileage_adjusted = current_price * mileage_multiplier
-        breakdown['mileage'] = {
-            'multiplier': mileage_multiplier,
-            'adjustment': mileage_adjusted - current_price,
-            'price_after': mileage_adjusted
-        }
-        current_price = mileage_adjusted
-        
-        # State
-        state_multiplier = self.state_multipliers.get(state.lower(), 0.92)
-        state_adjusted = current_price * state_multiplier
-        breakdown['state'] = {
-            'multiplier': state_multiplier,
-            'adjustment': state_adjusted - current_price,
-            'price_after': state_adjusted
-        }
-        current_price = state_adjusted
-        
-        # City
-        city_adjustment = self.city_adjustments.get(city.lower(), 1.0)
-        city_adjusted = current_price * city_adjustment
-        breakdown['city'] = {
-            'multiplier': city_adjustment,
-            'adjustment': city_adjusted - current_price,
-            'price_after': city_adjusted
-        }
+        price = (arrays['car_factor'][positions] * age_factors[:, 0]
+                 * arrays['condition_factor'][condition_codes] * mileage_multiplier
+                 * arrays['location_factor'][state_codes, city_codes] * market_factor)
         
-        breakdown['final_price'] = self.predict_price(car_id, car_age, condition, kilometers_driven, state, city)
+        # Round to nearest thousand with the ₹50,000 floor
+        price = np.round(price / 1000) * 1000
+        prices = np.maximum(price.astype(np.int64), 50000)
+        prices[~found] = 0
+        return prices
+
+    def get_price_breakdown(self, car_id, car_age, condition, kilometers_driven, state, city, market_date=None):
+        """Get detailed price breakdown for transparency.
         
-        return breakdown
+        Pass the prediction's date as market_date so final_price matches the stored price.
+        """
+        return self.predict_with_breakdown(
+            car_id, car_age, condition, kilometers_driven, state, city, market_date
+        )[1]
@@ -0,0 +1,208 @@
+import collections
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from invoice_store import InvoicePdfStore
+
+# Rendering is CPU-bound, so keep some cores free for serving requests. Every web
+# worker process has its own pool, so under gunicorn -w N there are N times this
+# many render processes; set the RENDER_WORKERS app config key to about
+# cores / 2 / N instead
+RENDER_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+# Renders allowed to wait for a worker before submit() refuses new ones
+MAX_PENDING_RENDERS = 500
+
+def render_invoice_to_store(directory, invoice_id, digest, invoice):
+    """Worker entry point: render one invoice PDF and write it to the store"""
+    from invoice_generator import InvoiceGenerator
+
+    pdf_data = InvoiceGenerator().render_to_bytes(invoice)
+    if not pdf_data.startswith(b'%PDF-') or len(pdf_data) < 100:
+        raise ValueError('Invalid PDF generated')
+    InvoicePdfStore(directory).put(invoice_id, digest, pdf_data)
+
+def render_invoices_to_file(path, invoices):
+    """Worker entry point: render several invoices into one combined PDF file"""
+    from invoice_generator import InvoiceGenerator
+
+    InvoiceGenerator().render(invoices, path)
+
+class RenderQueueFull(Exception):
+    """Raised when MAX_PENDING_RENDERS renders are already waiting, or no pool can take work"""
+
+class InvoiceRenderQueue:
+    """Renders invoice PDFs into an InvoicePdfStore on a bounded process pool.
+
+    The pool is created on first use in each process, so a pre-forking server's
+    master never starts workers that its children would inherit. max_workers is
+    therefore per web worker process, not a limit for the whole server.
+    """
+
+    def __init__(self, store, max_workers=RENDER_WORKERS, max_pending=MAX_PENDING_RENDERS):
+        self.store = store
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.completed = 0
+        self.failed = 0
+        self._executor = None
+        self._pid = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def configure(self, max_workers=None, max_pending=None):
+        """Change the pool size (per web worker process) and queue bound before first use"""
+        with self._lock:
+            if max_workers is not None:
+                if int(max_workers) < 1:
+                    raise ValueError('max_workers must be at least 1')
+                self.max_workers = int(max_workers)
+            if max_pending is not None:
+                self.max_pending = int(max_pending)
+
+    def _get_executor(self):
+        if self._executor is not None and getattr(self._executor, '_broken', False):
+            # A worker died (e.g. OOM-killed); the pool refuses all work from now on
+            self._reset_executor('A render worker exited unexpectedly')
+        if self._executor is None or self._pid != os.getpid():
+            # forkserver children don't inherit the request threads' locks;
+            # fall back to spawn where it doesn't exist (Windows)
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            if context.get_start_method() == 'forkserver':
+                context.set_forkserver_preload(['render_queue', 'invoice_generator'])
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            self._pid = os.getpid()
+            self._pending = {}
+        return self._executor
+
+    def _reset_executor(self, reason):
+        """Drop a broken pool, failing the renders it still had; the next use starts a new one"""
+        executor = self._executor
+        self._executor = None
+        if self._pid == os.getpid():
+            for invoice_id, digest in self._pending:
+                self.store.put_error(invoice_id, digest, reason)
+            self.failed += len(self._pending)
+            self._pending = {}
+            executor.shutdown(wait=False)
+
+    def _submit(self, function, *args):
+        """Submit to the pool, replacing it once if it turns out to be broken (call with the lock held)"""
+        try:
+            return self._get_executor().submit(function, *args)
+        except BrokenProcessPool:
+            self._reset_executor('A render worker exited unexpectedly')
+        try:
+            return self._get_executor().submit(function, *args)
+        except BrokenProcessPool:
+            self._reset_executor('Render workers could not be started')
+            raise RenderQueueFull()
+
+    def submit(self, invoice_id, digest, invoice):
+        """Queue a render unless the PDF is already stored or queued"""
+        key = (invoice_id, digest)
+        with self._lock:
+            if key in self._pending and self._pid == os.getpid():
+                return
+            if self.store.get(invoice_id, digest):
+                return
+            if len(self._pending) >= self.max_pending:
+                raise RenderQueueFull()
+
+            self.store.clear_error(invoice_id, digest)
+            future = self._submit(render_invoice_to_store, self.store.directory, invoice_id, digest, invoice)
+            self._pending[key] = future
+        future.add_done_callback(lambda done: self._finished(key, done))
+
+    def _finished(self, key, future):
+        with self._lock:
+            if self._pending.get(key) is not future:
+                return  # Already failed by _reset_executor, or superseded by a resubmit
+            del self._pending[key]
+            error = future.exception()
+            if error is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+                self.store.put_error(key[0], key[1], error)
+
+    def render_all(self, invoices, window=None):
+        """Yield (invoice, pdf path, error) for each invoice in order, rendering missing PDFs in parallel.
+
+        A failed render yields a None path and the error message instead of raising,
+        so the remaining invoices are still rendered. At most `window` renders are in
+        flight, so an arbitrarily long iterable of invoices is processed in constant
+        memory.
+        """
+        window = window or self.max_workers * 2
+        in_flight = collections.deque()
+
+        def collect(item):
+            invoice, digest, future = item
+            try:
+                if future is not None:
+                    future.result()
+            except Exception as e:
+                return invoice, None, str(e) or type(e).__name__
+            return invoice, self.store.path_for(invoice['id'], digest), None
+
+        for invoice in invoices:
+            digest = self.store.digest(invoice)
+            future = None
+            if not self.store.get(invoice['id'], digest):
+                try:
+                    with self._lock:
+                        future = self._submit(render_invoice_to_store, self.store.directory, invoice['id'],
+                                              digest, invoice)
+                except RenderQueueFull:
+                    yield invoice, None, 'Render workers are unavailable'
+                    continue
+            in_flight.append((invoice, digest, future))
+            if len(in_flight) >= window:
+                yield collect(in_flight.popleft())
+
+        while in_flight:
+            yield collect(in_flight.popleft())
+
+    def render_combined(self, invoices, path):
+        """Render invoices into one PDF at path on a worker, waiting for it to finish"""
+        with self._lock:
+            future = self._submit(render_invoices_to_file, path, invoices)
+        future.result()
+
+    def status(self, invoice_id, digest):
+        """Get 'ready', 'pending', 'failed' or 'missing' for an invoice render.
+
+        'pending' only covers renders queued by this process; 'failed' is read from
+        the store, so it is the same in every process.
+        """
+        if self.store.get(invoice_id, digest):
+            return 'ready'
+        with self._lock:
+            if (invoice_id, digest) in self._pending and self._pid == os.getpid():
+                return 'pending'
+        if self.store.get_error(invoice_id, digest) is not None:
+            return 'failed'
+        return 'missing'
+
+    def error(self, invoice_id, digest):
+        """Error message of a failed render, if any"""
+        return self.store.get_error(invoice_id, digest)
+
+    def stats(self):
+        """Queue depth and counters for monitoring"""
+        with self._lock:
+            pending = len(self._pending)
+            running = sum(1 for future in self._pending.values() if future.running())
+        return {
+            'workers': self.max_workers,
+            'pending': pending,
+            'running': running,
+            'queued': pending - running,
+            'max_pending': self.max_pending,
+            'completed': self.completed,
+            'failed': self.failed
+        }
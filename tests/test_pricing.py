@@ -0,0 +1,56 @@
+import random
+
+import numpy as np
+import pytest
+
+import database
+from benchmark import pricing_cases
+from price_predictor import CarPricePredictor, market_day, market_day_key, market_factor, market_factors
+
+@pytest.fixture
+def predictor(tmp_path, monkeypatch):
+    """Uncached predictor over a fresh copy of the sample catalog"""
+    monkeypatch.setattr(database, 'DATABASE_PATH', str(tmp_path / 'test.db'))
+    database.init_database()
+    predictor = CarPricePredictor(cache_size=0)
+    predictor.warm_up()
+    return predictor
+
+def test_predict_batch_matches_predict_price(predictor):
+    car_ids = sorted(predictor.get_car_catalog())
+    cases = pricing_cases(car_ids, 2000)
+    # Unknown car, ages past the per-age tables, fractional ages and odd spellings
+    cases += [
+        (max(car_ids) + 1, 3, 'good', 40000, 'delhi', 'pune'),
+        (car_ids[0], 60, 'fair', 900000, 'bihar', 'unknown'),
+        (car_ids[1], 2.5, 'excellent', 12000, 'Maharashtra', 'MUMBAI'),
+        (car_ids[2], 0, 'unknown', 0, 'goa', 'pune')
+    ]
+    
+    batch = predictor.predict_batch(*zip(*cases)).tolist()
+    for case, batch_price in zip(cases, batch):
+        assert batch_price == (predictor.predict_price(*case) or 0), case
+
+def test_batch_breakdowns_match_predict_with_breakdown(predictor):
+    cases = pricing_cases(sorted(predictor.get_car_catalog()), 200)
+    columns = list(zip(*cases))
+    prices = predictor.predict_batch(*columns).tolist()
+    for case, price, breakdown in zip(cases, prices, predictor.batch_breakdowns(*columns, prices)):
+        assert (price, breakdown) == predictor.predict_with_breakdown(*case)
+
+def test_market_factors_match_market_factor():
+    rng = random.Random(0)
+    day_key = market_day_key(market_day(), seed=7)
+    # Large values make every multiply wrap around 2**64
+    rows = [
+        (rng.randrange(1, 2 ** 31), rng.randrange(0, 100), rng.randrange(0, 8),
+         rng.randrange(0, 10 ** 7), rng.randrange(0, 40), rng.randrange(0, 40))
+        for _ in range(5000)
+    ]
+    columns = [np.array(column, dtype=np.int64) for column in zip(*rows)]
+    car_ids, car_ages, condition_codes, kilometers_driven, state_codes, city_codes = columns
+    
+    vectorized = market_factors(day_key, car_ids, car_ages, condition_codes, kilometers_driven.astype(np.float64),
+                                state_codes, city_codes).tolist()
+    assert vectorized == [market_factor(day_key, *row) for row in rows]
+    assert all(0.90 <= factor < 1.10 for factor in vectorized)
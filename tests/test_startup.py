@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+from benchmark import LAZY_MODULES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_import_app_does_not_load_lazy_modules():
+    """Heavy modules must only be imported on first use, not when app is imported"""
+    result = subprocess.run(
+        [sys.executable, '-c',
+         'import sys, app\n'
+         f'print(",".join(name for name in {LAZY_MODULES!r} if name in sys.modules))'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ''
+
+def test_import_database_does_not_load_flask():
+    """database is imported by the CLI and the render workers, which don't need Flask"""
+    result = subprocess.run(
+        [sys.executable, '-c', 'import sys, database, invoice_generator\nprint("flask" in sys.modules)'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == 'False'